@@ -1,12 +1,23 @@
-from fastapi import APIRouter, HTTPException, Response
+import asyncio
+import gzip
+import math
+import time
+from fastapi import APIRouter, HTTPException, Request, Response, UploadFile, File, Form
 from fastapi.responses import JSONResponse, StreamingResponse
-from typing import Dict
+from pydantic import TypeAdapter
+from starlette.concurrency import run_in_threadpool
+from starlette.formparsers import MultiPartParser
+from typing import Dict, Optional, Tuple
 
+from app.core.config import settings
 from app.models.camera import CameraCreate, Camera
+from app.services.image_decoder import image_decoder
 from app.services.camera_worker import (
     register_camera, 
     get_all_cameras, 
-    get_worker, 
+    get_all_workers,
+    get_camera_and_worker,
+    get_registry_etag,
     unregister_camera, 
     start_worker, 
     stop_worker
@@ -14,13 +25,53 @@ from app.services.camera_worker import (
 
 router = APIRouter()
 
+# Сериализуем список камер сразу в JSON через pydantic-core, минуя jsonable_encoder FastAPI
+_cameras_adapter = TypeAdapter(Dict[str, Camera])
+
+# Сжимаем только JSON и только достаточно большой; JPEG/MJPEG уже сжаты, gzip для них - пустая трата CPU
+_GZIP_MIN_SIZE = 1024
+
+def _json_response(request: Request, body: bytes, headers: Dict[str, str]) -> Response:
+    if len(body) >= _GZIP_MIN_SIZE and "gzip" in request.headers.get("accept-encoding", ""):
+        body = gzip.compress(body, compresslevel=6)
+        headers = {**headers, "Content-Encoding": "gzip", "Vary": "Accept-Encoding"}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Часть multipart/mixed ответа со снимками всех камер
+_SNAPSHOT_PART = b'--frame\r\nContent-Type: image/jpeg\r\nX-Camera-Id: %b\r\nContent-Length: %d\r\n\r\n%b\r\n'
+
+# Обязательные поля для каждого типа источника
+_REQUIRED_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "rtsp": ("source_url",),
+    "mjpeg": ("source_url",),
+    "http_push": (),
+    "onvif": ("ip_address", "username", "password"),
+}
+
+# Держим загружаемые кадры в памяти, а не во временном файле на диске. Это атрибут класса Starlette:
+# действует на все multipart-эндпоинты процесса, не только на push-ингест
+MultiPartParser.spool_max_size = settings.PUSH_SPOOL_MAX_SIZE
+
+async def _read_upload(upload: UploadFile) -> memoryview:
+    """Читает загруженный файл в заранее выделенный буфер, без промежуточного объекта bytes."""
+    if upload.size is None:
+        return memoryview(await upload.read())
+    buf = bytearray(upload.size)
+    if upload.size > MultiPartParser.spool_max_size:
+        await run_in_threadpool(upload.file.readinto, buf)
+    else:
+        upload.file.readinto(buf)
+    return memoryview(buf)
+
 @router.post("/cameras", response_model=Camera)
 async def register_new_camera(camera_data: CameraCreate):
     """Регистрирует новую камеру."""
-    if camera_data.source_type in ["rtsp", "mjpeg"] and not camera_data.source_url:
-        raise HTTPException(status_code=400, detail=f"Source type '{camera_data.source_type}' requires a source_url.")
+    missing = [f for f in _REQUIRED_FIELDS[camera_data.source_type] if not getattr(camera_data, f)]
+    if missing:
+        raise HTTPException(status_code=400, detail=f"Source type '{camera_data.source_type}' requires: {', '.join(missing)}.")
 
-    camera = Camera(**camera_data.model_dump())
+    # Данные уже провалидированы FastAPI как CameraCreate, повторная валидация не нужна
+    camera = Camera.model_construct(**camera_data.__dict__)
     
     try:
         registered_camera = await register_camera(camera)
@@ -28,10 +79,13 @@ async def register_new_camera(camera_data: CameraCreate):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/cameras", response_model=Dict[str, Camera])
-async def get_cameras_list():
-    """Возвращает список всех зарегистрированных камер."""
-    return get_all_cameras()
+@router.get("/cameras", responses={200: {"model": Dict[str, Camera]}})
+async def get_cameras_list(request: Request):
+    """Возвращает список всех зарегистрированных камер (304, если список не менялся)."""
+    headers = {"ETag": get_registry_etag()}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=304, headers=headers)
+    return _json_response(request, _cameras_adapter.dump_json(get_all_cameras()), headers)
 
 @router.delete("/cameras/{camera_id}", status_code=204)
 async def unregister_existing_camera(camera_id: str):
@@ -40,25 +94,88 @@ async def unregister_existing_camera(camera_id: str):
         raise HTTPException(status_code=404, detail="Camera not found")
     return Response(status_code=204)
 
+@router.get("/cameras/frames/latest", response_class=Response)
+async def get_all_latest_frames():
+    """Возвращает последние кадры всех камер одним multipart/mixed ответом; кодирование идет параллельно."""
+    workers = list(get_all_workers().items())
+    jpegs = await asyncio.gather(*(worker.get_latest_frame_jpeg() for _, worker in workers))
+    parts = [_SNAPSHOT_PART % (camera_id.encode(), len(jpeg), jpeg)
+             for (camera_id, _), jpeg in zip(workers, jpegs) if jpeg]
+    parts.append(b'--frame--\r\n')
+    return Response(content=b"".join(parts), media_type="multipart/mixed; boundary=frame")
+
 @router.get("/cameras/{camera_id}/frame/latest", response_class=Response)
-async def get_latest_frame(camera_id: str):
-    """Возвращает последний кадр с камеры в виде JPEG."""
-    worker = get_worker(camera_id)
+async def get_latest_frame(camera_id: str, request: Request):
+    """Возвращает последний кадр с камеры в виде JPEG (304, если кадр у клиента уже есть)."""
+    _, worker = get_camera_and_worker(camera_id)
     if not worker:
         raise HTTPException(status_code=404, detail="Camera or worker not found.")
-    jpeg_bytes = worker.get_latest_frame_jpeg()
+    etag = worker.frame_etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    jpeg_bytes = await worker.get_latest_frame_jpeg()
     if not jpeg_bytes:
         raise HTTPException(status_code=404, detail="No frames available for this camera.")
-    return Response(content=jpeg_bytes, media_type="image/jpeg")
+    return Response(content=jpeg_bytes, media_type="image/jpeg", headers=headers)
 
 @router.get("/cameras/{camera_id}/stream/live.mjpeg")
 async def get_live_mjpeg_stream(camera_id: str):
     """Отдает живой MJPEG-поток с камеры для просмотра в браузере или VLC."""
-    worker = get_worker(camera_id)
+    _, worker = get_camera_and_worker(camera_id)
     if not worker or not worker.is_running:
         raise HTTPException(status_code=404, detail="Camera worker not found or not running.")
     
     return StreamingResponse(
         worker.get_mjpeg_stream_generator(),
-        media_type='multipart/x-mixed-replace; boundary=frame'
-    )
\ No newline at end of file
+        media_type='multipart/x-mixed-replace; boundary=frame',
+        headers={"Cache-Control": "no-store"}
+    )
+
+def _get_push_worker(camera_id: str):
+    camera, worker = get_camera_and_worker(camera_id)
+    if not camera:
+        raise HTTPException(status_code=404, detail="Camera not found. Please register it first.")
+    if camera.source_type != "http_push":
+        raise HTTPException(status_code=400, detail="This camera is not configured for HTTP push ingestion.")
+    if not worker:
+        raise HTTPException(status_code=404, detail="Camera worker not found.")
+    return worker
+
+async def _ingest_pushed_frame(worker, image_data, timestamp: Optional[float]) -> JSONResponse:
+    # nan/inf проходят float(), но в событии frame.received дали бы невалидный JSON
+    if timestamp is not None and not math.isfinite(timestamp):
+        raise HTTPException(status_code=400, detail="Timestamp must be a finite number.")
+    # Декодирование JPEG (миллисекунды на Full HD) - в пуле потоков, чтобы не держать цикл событий
+    frame = await run_in_threadpool(image_decoder.decode, image_data) if len(image_data) else None
+    if frame is None:
+        raise HTTPException(status_code=400, detail="Could not decode image file.")
+    frame_time = timestamp if timestamp else time.time()
+    await worker.push_frame(frame, frame_time, image_data)
+    return JSONResponse(content={"message": "Frame ingested successfully", "timestamp": frame_time})
+
+@router.post("/ingest/push/{camera_id}")
+async def http_push_ingest(
+    camera_id: str,
+    frame_file: UploadFile = File(...),
+    timestamp: Optional[float] = Form(None)
+):
+    """Принимает JPEG-кадр, отправленный камерой, и передает его в воркер."""
+    worker = _get_push_worker(camera_id)
+    image_data = await _read_upload(frame_file)
+    return await _ingest_pushed_frame(worker, image_data, timestamp)
+
+@router.post(
+    "/ingest/push/{camera_id}/raw",
+    openapi_extra={"requestBody": {"required": True, "content": {"image/jpeg": {"schema": {"type": "string", "format": "binary"}}}}}
+)
+async def http_push_ingest_raw(camera_id: str, request: Request):
+    """Принимает JPEG-кадр прямо в теле запроса, без multipart и валидации формы; время кадра - в X-Frame-Timestamp."""
+    worker = _get_push_worker(camera_id)
+    timestamp = request.headers.get("x-frame-timestamp")
+    try:
+        frame_time = float(timestamp) if timestamp else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="X-Frame-Timestamp must be a number.")
+    image_data = await request.body()
+    return await _ingest_pushed_frame(worker, image_data, frame_time)
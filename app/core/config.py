@@ -1,10 +1,14 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import Optional
+from typing import Optional, Literal
 
 class Settings(BaseSettings):
     # --- Redis ---
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
+    # Сколько соединений с Redis держит общий пул (pipeline, кадры, подписки слушателей)
+    REDIS_POOL_SIZE: int = 16
+    # Сколько событий может ждать отправки в Redis; сверх этого новые события отбрасываются
+    REDIS_QUEUE_SIZE: int = 10000
 
     # --- Telegram ---
     TELEGRAM_BOT_TOKEN: Optional[str] = None
@@ -15,12 +19,37 @@ class Settings(BaseSettings):
     # --- Настройки детектора ---
     PERSON_COOLDOWN_SECONDS: int = 10
     YOLO_CONFIDENCE_THRESHOLD: float = 0.65
+    # FP16-движок TensorRT для YOLO (путь относительно папки models); если не задан - OpenCV DNN
+    YOLO_TRT_ENGINE: Optional[str] = None
+    # Батчинг YOLO между камерами: сколько кадров максимум в одном forward и сколько ждать их накопления
+    YOLO_MAX_BATCH: int = 8
+    YOLO_BATCH_WAIT_MS: int = 20
+    # Сколько секунд кадр с найденными людьми хранится в Redis (ключ frame:<uuid>) для подписчиков
+    DETECTION_FRAME_TTL: int = 60
 
     # Минимальная площадь движения в пикселях, чтобы сработал "дешевый" детектор
     MOTION_MIN_AREA: int = 1500 
+    # Во сколько раз уменьшать кадр перед поиском движения (площадь выше задана для полного разрешения)
+    MOTION_SCALE: int = 4
+    # Каждый какой кадр проверять на движение (при 30 FPS шаг 6 дает 5 проверок в секунду)
+    ANALYSIS_FRAME_STRIDE: int = 6
     # Как часто (в секундах) можно запускать YOLO для одной камеры, даже если есть движение
     YOLO_TRIGGER_COOLDOWN: int = 3
 
+    # Чем читать RTSP/MJPEG: pyav (многопоточное декодирование FFmpeg) или opencv (cv2.VideoCapture)
+    VIDEO_DECODER: Literal["opencv", "pyav"] = "pyav"
+    # Аппаратное декодирование потоков: тип устройства FFmpeg (cuda - NVDEC, vaapi); None - программное
+    VIDEO_HWACCEL: Optional[str] = None
+    # Бэкенд декодирования JPEG для HTTP push: opencv, pillow, turbojpeg (SIMD) или nvjpeg (GPU)
+    JPEG_DECODER: Literal["opencv", "pillow", "turbojpeg", "nvjpeg"] = "turbojpeg"
+    # Бэкенд кодирования JPEG для /frame/latest и MJPEG: opencv, turbojpeg (SIMD) или nvjpeg (GPU)
+    JPEG_ENCODER: Literal["opencv", "turbojpeg", "nvjpeg"] = "turbojpeg"
+    JPEG_QUALITY: int = 95
+    # До какого размера (в байтах) загружаемый кадр хранится в памяти, а не во временном файле.
+    # Задается на весь процесс (MultiPartParser.spool_max_size), то есть для всех multipart-эндпоинтов:
+    # Starlette не дает задать его для одного маршрута. Сейчас multipart принимает только push-ингест
+    PUSH_SPOOL_MAX_SIZE: int = 8 * 1024 * 1024
+
     # --- Путь к файлу с камерами ---
     CAMERA_DB_FILE: str = "cameras.json"
 
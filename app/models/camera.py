@@ -9,6 +9,11 @@ class CameraBase(BaseModel):
     source_type: SourceType = Field(..., description="Тип источника: rtsp, mjpeg, http_push, onvif")
 
 class CameraCreate(CameraBase):
+    # ID попадает в заголовки ответов (X-Camera-Id), URL и имена каналов Redis: только видимые ASCII-символы,
+    # без пробелов и управляющих символов (CR/LF сломали бы multipart-ответ)
+    id: str = Field(..., pattern=r"^[!-~]+$", max_length=128,
+                    description="Уникальный ID камеры, например 'cam_001' (видимые ASCII-символы, без пробелов)")
+
     # Для потоковых камер (rtsp, mjpeg) URL может быть предоставлен напрямую
     source_url: Optional[str] = Field(None, description="Прямая ссылка на видеопоток (для rtsp и mjpeg)")
     
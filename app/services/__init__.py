@@ -1,7 +1,9 @@
 from .camera_worker import (
-    register_camera, get_all_cameras, get_worker, unregister_camera, start_worker, stop_worker
+    register_camera, get_all_cameras, get_worker, get_all_workers, get_camera_and_worker, unregister_camera, start_worker, stop_worker
 )
 from .redis_publisher import redis_publisher
+from .image_decoder import image_decoder
+from .image_encoder import image_encoder
 from .metrics import (
     update_camera_status, increment_frames_ingested, increment_motion_detected, update_last_frame_timestamp, get_metrics
 )
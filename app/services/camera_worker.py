@@ -1,16 +1,20 @@
 import asyncio
+import threading
 import cv2
 import time
-import json
+import orjson
 import numpy as np
 import uuid
 import os
-from typing import Optional, Dict
-from pathlib import Path
+from typing import Callable, List, Optional, Dict, Set, Tuple
+from concurrent.futures import ThreadPoolExecutor
 
 from app.models.camera import Camera
 from app.utils.circular_buffer import CircularBuffer
 from app.services.redis_publisher import redis_publisher
+from app.services.image_encoder import image_encoder
+from app.services.video_capture import VideoCapture, open_video_capture
+from app.services.person_detector import PersonDetector, yolo_service, CUDA_AVAILABLE, YOLO_INPUT_SIZE
 from app.services.metrics import (
     update_camera_status,
     increment_frames_ingested,
@@ -22,27 +26,41 @@ from app.core.config import settings
 camera_store: Dict[str, Camera] = {}
 worker_store: Dict[str, 'CameraWorker'] = {}
 task_store: Dict[str, asyncio.Task] = {}
+# Камера и ее воркер одной записью: горячие эндпоинты получают обе за один dict.get
+registry_store: Dict[str, Tuple[Camera, Optional['CameraWorker']]] = {}
+# Версия списка камер для ETag в GET /cameras: растет при любом изменении камер или их статусов
+_registry_version: int = 0
+_BOOT_ID = uuid.uuid4().hex[:8]
+# Кого уведомлять, когда камеры добавляются или удаляются (слушатели Redis обновляют подписки)
+_camera_set_listeners: List[Callable[[], None]] = []
 
-# --- Папка для временных кадров ---
-TEMP_FRAME_DIR = "/tmp/camera_frames"
-os.makedirs(TEMP_FRAME_DIR, exist_ok=True)
+# Типы источников, которые воркер читает сам через VideoCapture
+_STREAMABLE = frozenset({"rtsp", "mjpeg"})
 
-# --- Определяем абсолютный путь к корню проекта ---
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
+# Шаблон одной части multipart/x-mixed-replace: граница, заголовки, кадр и хвостовой CRLF
+_MJPEG_PART = b'--frame\r\nContent-Type: image/jpeg\r\nContent-Length: %d\r\n\r\n%b\r\n'
+
+# Пул для кодирования JPEG: и OpenCV, и libjpeg-turbo отпускают GIL, так что камеры кодируются параллельно
+_ENCODE_POOL = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="jpeg-encode")
+# Проверка движения идет для каждой камеры каждые ANALYSIS_FRAME_STRIDE кадров: пул по числу ядер
+# (cv2 отпускает GIL), чтобы камеры считались параллельно, а не в очереди друг за другом и за YOLO
+_MOTION_POOL = ThreadPoolExecutor(max_workers=os.cpu_count(), thread_name_prefix="motion")
+# Подготовка входа YOLO: свой небольшой пул, чтобы не конкурировать с кодированием JPEG и движением
+_INFER_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="infer")
 
 
 class CameraWorker:
     """
     Универсальный воркер для захвата, буферизации, трансляции и (опционально) анализа видео.
     """
-    def __init__(self, camera_id: str, stream_url: str, buffer_capacity: int = 10):
+    def __init__(self, camera_id: str, stream_url: str, source_type: str = "rtsp", buffer_capacity: int = 10):
         self.camera_id = camera_id
         self.stream_url = stream_url
         self.buffer = CircularBuffer(buffer_capacity)
         self._stop_event = asyncio.Event()
         self.is_running = False
         self.reconnect_delay = 1.0
-        self.source_type = "rtsp"
+        self.source_type = source_type
         
         # --- Метаданные потока ---
         self.stream_width: Optional[int] = None
@@ -50,36 +68,61 @@ class CameraWorker:
         self.stream_fps: Optional[float] = None
         
         # --- Переменные для прореженной публикации событий ---
-        self.last_event_pub_time: float = 0.0
-        self.EVENT_PUB_INTERVAL: int = 1
+        # Интервалы и кулдауны считаются по монотонным часам цикла (loop.time()), а не по time.time();
+        # frame.received уходит раз в секунду (при смене целой секунды этих часов) как heartbeat:
+        # вместе с числом кадров, принятых с прошлого события
+        self._last_pub_sec: int = -1
+        self._frames_since_pub: int = 0
+        # frame.received собирается из готового префикса и timestamp, без json.dumps на каждое событие
+        self._event_channel = f"camera:{camera_id}"
+        self._frame_event_prefix = (
+            b'{"event_type":"frame.received","data":{"camera_id":' + orjson.dumps(camera_id)
+            + b',"source":' + orjson.dumps(source_type) + b',"timestamp":')
+
+        # --- Кэш JPEG последнего кадра: кодируем один раз на кадр, а не на каждого зрителя ---
+        self._frame_seq: int = 0
+        self._latest_jpeg: Optional[bytes] = None
+        self._latest_jpeg_seq: int = 0
+        self._jpeg_future: Optional[asyncio.Future] = None
+        self._jpeg_future_seq: int = 0
+        self._new_frame = asyncio.Event()
 
         # --- ML & Оптимизация (Инициализируется всегда, но используется опционально) ---
         self.person_detection_enabled = settings.ENABLE_PERSON_DETECTION
         self.person_cooldown_end = 0.0
         self.yolo_trigger_cooldown_end = 0.0
         
-        self.frames_to_skip = 5
+        # Анализируется каждый analysis_stride-й кадр: для движения хватает нескольких кадров в секунду
+        self.analysis_stride = settings.ANALYSIS_FRAME_STRIDE
         self.frame_counter = 0
         self.motion_last_frame = None
+        # Движение ищем на копии, уменьшенной в MOTION_SCALE раз (INTER_AREA усредняет и заменяет размытие);
+        # порог площади масштабируем так же
+        self.motion_scale = 1 / settings.MOTION_SCALE
+        self.motion_min_area = settings.MOTION_MIN_AREA / settings.MOTION_SCALE ** 2
+        # Буферы миниатюры выделяются по первому кадру и переиспользуются (dst=): серых два,
+        # они чередуются - в один пишется текущий кадр, во втором лежит предыдущий
+        self._motion_small: Optional[np.ndarray] = None
+        self._motion_gray: Tuple[np.ndarray, ...] = ()
+        self._motion_delta: Optional[np.ndarray] = None
+        # Анализ (движение + YOLO) идет своей задачей, чтобы не тормозить прием кадров;
+        # очередь на один кадр: пока идет анализ, ждущий кадр заменяется свежим
+        self._analysis_queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        self._analysis_task: Optional[asyncio.Task] = None
+        # В очереди лежит вид на слот кольцевого буфера, а поток чтения продолжает писать в кольцо:
+        # движение считается прямо по слоту с проверкой holds() после чтения, а для YOLO и снимка кадр
+        # копируется в свой буфер (выделяется по первому кадру) - только если движение найдено
+        self._analysis_frame: Optional[np.ndarray] = None
+        # При CUDA кадр загружается на GPU один раз: на нем считается движение и из него же строится вход YOLO
+        self._gpu_frame = cv2.cuda_GpuMat() if CUDA_AVAILABLE else None
+        self._gpu_stream = cv2.cuda_Stream() if CUDA_AVAILABLE else None
+        self._gpu_motion_prev = None
 
         if self.person_detection_enabled:
-            # Загружаем ML модель только если она включена в настройках
-            print(f"Person detection is ENABLED for {camera_id}. Loading YOLO model...")
-            weights_path = str(BASE_DIR / "models" / "yolov4-tiny.weights")
-            config_path = str(BASE_DIR / "models" / "yolov4-tiny.cfg")
-            names_path = str(BASE_DIR / "models" / "coco.names")
-
-            self.net = cv2.dnn.readNetFromDarknet(config_path, weights_path)
-            self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
-            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
-
-            with open(names_path, "r") as f:
-                self.class_names = [line.strip() for line in f.readlines()]
-            self.person_class_id = self.class_names.index('person')
-            
-            layer_names = self.net.getLayerNames()
-            self.output_layers = [layer_names[i - 1] for i in self.net.getUnconnectedOutLayers().flatten()]
-            print(f"YOLOv4-tiny person detector initialized for worker {camera_id}.")
+            # Модель общая для всех воркеров (yolo_service) и загружается один раз, в start_worker
+            print(f"Person detection is ENABLED for {camera_id}.")
+            # Свой блоб на воркер: у воркера одновременно идет не больше одной детекции
+            self._yolo_blob = np.empty((1, 3, *YOLO_INPUT_SIZE[::-1]), dtype=np.float32)
         else:
             print(f"Person detection is DISABLED for {camera_id}.")
 
@@ -87,11 +130,26 @@ class CameraWorker:
         if self.is_running: return
         self._stop_event.clear()
         task = asyncio.create_task(self._run(), name=f"Worker-{self.camera_id}")
+        task.add_done_callback(self._on_task_done)
         task_store[self.camera_id] = task
         self.is_running = True
         print(f"Async Worker {self.camera_id} started.")
 
+    def _on_task_done(self, task: asyncio.Task):
+        # Задача завершилась сама (упала) или остановлена: убираем ее из реестра, чтобы он не держал
+        # мертвую задачу вместе с воркером и его буфером кадров
+        if task_store.get(self.camera_id) is task:
+            del task_store[self.camera_id]
+        self.is_running = False
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Worker {self.camera_id} task failed: {task.exception()!r}")
+
     async def stop(self):
+        if self._analysis_task is not None:
+            self._analysis_task.cancel()
+            try: await self._analysis_task
+            except asyncio.CancelledError: pass
+            self._analysis_task = None
         if not self.is_running or self.camera_id not in task_store: return
         self._stop_event.set()
         task = task_store.pop(self.camera_id, None)
@@ -103,147 +161,309 @@ class CameraWorker:
         print(f"Async Worker {self.camera_id} stopped.")
 
     async def _run(self):
+        loop = asyncio.get_running_loop()
         while not self._stop_event.is_set():
             try:
-                cap = await asyncio.to_thread(cv2.VideoCapture, self.stream_url)
-                if not cap.isOpened():
-                    await self._handle_disconnect(f"Failed to open stream: {self.stream_url}")
+                try:
+                    cap = await loop.run_in_executor(None, open_video_capture, self.stream_url)
+                except OSError as e:
+                    await self._handle_disconnect(str(e))
                     await asyncio.sleep(self.reconnect_delay)
                     self.reconnect_delay = min(60, self.reconnect_delay * 2)
                     continue
 
-                self.stream_width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                self.stream_height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                self.stream_fps = cap.get(cv2.CAP_PROP_FPS)
+                self.stream_width = cap.width
+                self.stream_height = cap.height
+                self.stream_fps = cap.fps
                 print(f"Stream {self.camera_id} metadata: {self.stream_width}x{self.stream_height} @ {self.stream_fps:.2f} FPS")
 
                 await self._handle_connect()
                 self.reconnect_delay = 1.0
 
-                while not self._stop_event.is_set():
-                    ret, frame = await asyncio.to_thread(cap.read)
-                    if not ret:
-                        await self._handle_disconnect("Stream closed or error occurred.")
-                        break
-                    
-                    await self._process_frame(frame, time.time())
-                    
-                await asyncio.to_thread(cap.release)
+                # Конвейер: поток чтения декодирует следующий кадр, пока цикл событий обрабатывает текущий;
+                # в очереди только самый свежий кадр
+                frames: asyncio.Queue = asyncio.Queue(maxsize=1)
+                stop_reading = threading.Event()
+                reader = threading.Thread(
+                    target=self._read_frames, args=(cap, loop, frames, stop_reading),
+                    name=f"decode-{self.camera_id}", daemon=True)
+                reader.start()
+                try:
+                    while not self._stop_event.is_set():
+                        item = await frames.get()
+                        if item is None:
+                            await self._handle_disconnect("Stream closed or error occurred.")
+                            break
+                        await self._process_frame(*item)
+                finally:
+                    stop_reading.set()
+                    # Ждем, пока поток дочитает кадр и закроет камеру: следующий поток чтения пишет в тот же буфер
+                    await asyncio.to_thread(reader.join)
             except Exception as e:
                 print(f"Error in worker {self.camera_id} run loop: {e}")
                 await asyncio.sleep(5)
 
+    def _read_frames(self, cap: VideoCapture, loop: asyncio.AbstractEventLoop, frames: asyncio.Queue,
+                     stop_reading: threading.Event):
+        """
+        Поток чтения камеры: декодирует кадры подряд сразу в следующий слот кольцевого буфера, фиксирует
+        их там и передает в цикл событий без захода в пул потоков на каждый кадр (None - конец потока).
+        Пока цикл событий не забрал предыдущий кадр, кадры только пропускаются через grab(): без перевода
+        в BGR и записи в буфер, а цикл событий следом получает самый свежий кадр, а не очередь устаревших.
+        Открытый поток камеры закрывает сам.
+        """
+        shape = (cap.height, cap.width, 3) if cap.width and cap.height else None
+        try:
+            while not stop_reading.is_set():
+                try:
+                    if frames.empty():
+                        ret, frame = cap.read(self.buffer.next_slot(shape) if shape else None)
+                    elif cap.grab():
+                        continue
+                    else:
+                        ret = False
+                except cv2.error:
+                    ret = False
+                if stop_reading.is_set():
+                    break
+                item = None
+                if ret:
+                    timestamp = time.time()
+                    # Если поток сменил разрешение, кадр пришел в новом массиве - put скопирует его
+                    self.buffer.put(frame, timestamp)
+                    item = (frame, timestamp)
+                loop.call_soon_threadsafe(self._deliver_frame, frames, item)
+                if item is None:
+                    break
+        except RuntimeError:
+            # Цикл событий уже закрыт (остановка приложения)
+            pass
+        finally:
+            cap.release()
+
+    @staticmethod
+    def _deliver_frame(frames: asyncio.Queue, item: Optional[Tuple[np.ndarray, float]]):
+        # Если обработка не успевает, выбрасываем самый старый кадр
+        if frames.full():
+            frames.get_nowait()
+        frames.put_nowait(item)
+
     async def _handle_connect(self):
-        if self.camera_id in camera_store: camera_store[self.camera_id].status = "connected"
+        _set_camera_status(self.camera_id, "connected")
         update_camera_status(self.camera_id, True)
-        await redis_publisher.publish(
+        redis_publisher.publish(
             channel=f"camera:{self.camera_id}", event_type="camera.connected",
             data={"camera_id": self.camera_id, "timestamp": time.time(), "width": self.stream_width, "height": self.stream_height, "fps": self.stream_fps})
         print(f"Camera {self.camera_id} connected.")
 
     async def _handle_disconnect(self, reason: str):
-        if self.camera_id in camera_store: camera_store[self.camera_id].status = "disconnected"
+        _set_camera_status(self.camera_id, "disconnected")
         update_camera_status(self.camera_id, False)
-        await redis_publisher.publish(channel=f"camera:{self.camera_id}", event_type="camera.disconnected", data={"camera_id": self.camera_id, "reason": reason, "timestamp": time.time()})
+        redis_publisher.publish(channel=f"camera:{self.camera_id}", event_type="camera.disconnected", data={"camera_id": self.camera_id, "reason": reason, "timestamp": time.time()})
         print(f"Camera {self.camera_id} disconnected. Reason: {reason}")
 
     def _detect_simple_motion(self, frame_gray: np.ndarray) -> bool:
-        if self.motion_last_frame is None:
+        """Движение есть, если на миниатюре изменилось больше пикселей, чем motion_min_area."""
+        if self.motion_last_frame is None or self.motion_last_frame.shape != frame_gray.shape:
             self.motion_last_frame = frame_gray
             return False
-        frame_delta = cv2.absdiff(self.motion_last_frame, frame_gray)
+        frame_delta = cv2.absdiff(self.motion_last_frame, frame_gray, dst=self._motion_delta)
         self.motion_last_frame = frame_gray
-        thresh = cv2.threshold(frame_delta, 25, 255, cv2.THRESH_BINARY)[1]
-        thresh = cv2.dilate(thresh, None, iterations=2)
-        contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        for contour in contours:
-            if cv2.contourArea(contour) > settings.MOTION_MIN_AREA:
-                return True
-        return False
-
-    async def _process_frame(self, frame: np.ndarray, timestamp: float):
-        self.buffer.put((frame, timestamp))
+        # Для решения "запускать ли YOLO" хватает числа изменившихся пикселей: без dilate и контуров
+        return cv2.countNonZero(cv2.compare(frame_delta, 25, cv2.CMP_GT, dst=frame_delta)) > self.motion_min_area
+
+    async def _process_frame(self, frame: np.ndarray, timestamp: float, jpeg: Optional[bytes] = None):
+        # Кадр уже лежит в self.buffer: его кладет туда источник (_read_frames или push_frame)
+        # Если кадр пришел уже в JPEG (http_push), отдаем его зрителям как есть
+        self._frame_seq += 1
+        if jpeg is not None:
+            self._latest_jpeg = jpeg
+            self._latest_jpeg_seq = self._frame_seq
+        self._new_frame.set()
+        self._new_frame = asyncio.Event()
         increment_frames_ingested(self.camera_id, self.source_type)
         update_last_frame_timestamp(self.camera_id, timestamp)
         
-        current_time = time.time()
-        if (current_time - self.last_event_pub_time) > self.EVENT_PUB_INTERVAL:
-            self.last_event_pub_time = current_time
-            await redis_publisher.publish(
-                channel=f"camera:{self.camera_id}", event_type="frame.received",
-                data={"camera_id": self.camera_id, "timestamp": timestamp, "source": self.source_type})
+        now = asyncio.get_running_loop().time()
+        sec = int(now)
+        self._frames_since_pub += 1
+        if sec != self._last_pub_sec:
+            self._last_pub_sec = sec
+            redis_publisher.publish_raw(
+                self._event_channel,
+                b'%b%r,"fps":%d}}' % (self._frame_event_prefix, timestamp, self._frames_since_pub))
+            self._frames_since_pub = 0
         
         # --- ГЛАВНЫЙ РУБИЛЬНИК ---
         # Выполняем ML-анализ только если он включен в настройках
         if self.person_detection_enabled:
             self.frame_counter += 1
-            if self.frame_counter > self.frames_to_skip:
+            if self.frame_counter >= self.analysis_stride:
                 self.frame_counter = 0
-                if time.time() >= self.yolo_trigger_cooldown_end:
-                    frame_gray_blurred = cv2.GaussianBlur(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (21, 21), 0)
-                    if self._detect_simple_motion(frame_gray_blurred):
-                        self.yolo_trigger_cooldown_end = time.time() + settings.YOLO_TRIGGER_COOLDOWN
-                        print(f"Significant motion detected on {self.camera_id}. Running YOLO...")
-                        await self._detect_persons_yolo(frame.copy())
-    
-    async def _detect_persons_yolo(self, frame: np.ndarray):
-        if time.time() < self.person_cooldown_end: return
+                if now >= self.yolo_trigger_cooldown_end:
+                    if self._analysis_task is None:
+                        self._analysis_task = asyncio.create_task(self._analysis_loop(), name=f"Analysis-{self.camera_id}")
+                    if self._analysis_queue.full():
+                        self._analysis_queue.get_nowait()
+                    self._analysis_queue.put_nowait((frame, timestamp))
+
+    async def _analysis_loop(self):
+        while True:
+            frame, timestamp = await self._analysis_queue.get()
+            try:
+                # Вся проверка движения (ресайз, серый, разница, порог) - один переход в пул, не на цикле событий
+                if await asyncio.get_running_loop().run_in_executor(_MOTION_POOL, self._has_motion, frame, timestamp):
+                    self.yolo_trigger_cooldown_end = asyncio.get_running_loop().time() + settings.YOLO_TRIGGER_COOLDOWN
+                    print(f"Significant motion detected on {self.camera_id}. Running YOLO...")
+                    await self._detect_persons_yolo(frame, timestamp)
+            except Exception as e:
+                print(f"Error in analysis for {self.camera_id}: {e}")
+
+    def _copy_analysis_frame(self, frame: np.ndarray, timestamp: float) -> Optional[np.ndarray]:
+        """
+        Копирует кадр в буфер анализа. None, если слот уже ушел под новый кадр: сначала копия,
+        потом проверка (как в seqlock), иначе поток чтения мог начать писать в слот посреди копирования.
+        """
+        if not self.buffer.holds(frame, timestamp):
+            return None
+        if self._analysis_frame is None or self._analysis_frame.shape != frame.shape:
+            self._analysis_frame = np.empty_like(frame)
+        np.copyto(self._analysis_frame, frame)
+        return self._analysis_frame if self.buffer.holds(frame, timestamp) else None
+
+    def _has_motion(self, frame: np.ndarray, timestamp: float) -> bool:
+        """
+        Считает движение прямо по слоту кольцевого буфера, без копии кадра. Слот проверяется после
+        чтения (ресайза или загрузки на GPU): если его уже заняли под новый кадр, результат выбрасывается.
+        """
+        if not self.buffer.holds(frame, timestamp):
+            return False
+        if self._gpu_frame is not None:
+            return self._detect_motion_gpu(frame, timestamp)
+        H, W = frame.shape[:2]
+        h, w = round(H * self.motion_scale), round(W * self.motion_scale)
+        if self._motion_small is None or self._motion_small.shape[:2] != (h, w):
+            self._motion_small = np.empty((h, w, 3), dtype=np.uint8)
+            self._motion_gray = (np.empty((h, w), dtype=np.uint8), np.empty((h, w), dtype=np.uint8))
+            self._motion_delta = np.empty((h, w), dtype=np.uint8)
+            self.motion_last_frame = None
+        cv2.resize(frame, (w, h), dst=self._motion_small, interpolation=cv2.INTER_AREA)
+        # Проверяем до того, как миниатюра попадет в состояние детектора (motion_last_frame)
+        if not self.buffer.holds(frame, timestamp):
+            return False
+        gray = self._motion_gray[self.motion_last_frame is self._motion_gray[0]]
+        cv2.cvtColor(self._motion_small, cv2.COLOR_BGR2GRAY, dst=gray)
+        return self._detect_simple_motion(gray)
+
+    def _detect_motion_gpu(self, frame: np.ndarray, timestamp: float) -> bool:
+        """
+        То же, что _detect_simple_motion, целиком на GPU: кадр загружается один раз (он же нужен YOLO),
+        операции идут в одном CUDA-потоке, а на хост возвращается только число изменившихся пикселей.
+        """
+        stream = self._gpu_stream
+        self._gpu_frame.upload(frame, stream)
+        # Загрузка асинхронная: дожидаемся ее и только потом проверяем, что слот не заняли под новый кадр
+        stream.waitForCompletion()
+        if not self.buffer.holds(frame, timestamp):
+            return False
         H, W = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, (416, 416), swapRB=True, crop=False)
-        self.net.setInput(blob)
-        layer_outputs = await asyncio.to_thread(self.net.forward, self.output_layers)
-        boxes, confidences, class_ids = [], [], []
-        for output in layer_outputs:
-            for detection in output:
-                scores = detection[5:]
-                class_id = np.argmax(scores)
-                confidence = scores[class_id]
-                if class_id == self.person_class_id and confidence > settings.YOLO_CONFIDENCE_THRESHOLD:
-                    box = detection[0:4] * np.array([W, H, W, H])
-                    (centerX, centerY, width, height) = box.astype("int")
-                    x = int(centerX - (width / 2))
-                    y = int(centerY - (height / 2))
-                    boxes.append([x, y, int(width), int(height)])
-                    confidences.append(float(confidence))
-                    class_ids.append(class_id)
+        small = cv2.cuda.resize(self._gpu_frame, (round(W * self.motion_scale), round(H * self.motion_scale)),
+                                interpolation=cv2.INTER_AREA, stream=stream)
+        gray = cv2.cuda.cvtColor(small, cv2.COLOR_BGR2GRAY, stream=stream)
+        prev, self._gpu_motion_prev = self._gpu_motion_prev, gray
+        if prev is None or prev.size() != gray.size():
+            stream.waitForCompletion()
+            return False
+        delta = cv2.cuda.absdiff(prev, gray, stream=stream)
+        _, thresh = cv2.cuda.threshold(delta, 25, 255, cv2.THRESH_BINARY, stream=stream)
+        stream.waitForCompletion()
+        return cv2.cuda.countNonZero(thresh) > self.motion_min_area
+
+    async def push_frame(self, frame: np.ndarray, timestamp: float, jpeg: Optional[bytes] = None):
+        """Принимает кадр от http_push камеры и прогоняет его через общий конвейер."""
+        self.buffer.put(frame, timestamp)
+        await self._process_frame(frame, timestamp, jpeg)
+
+    async def _detect_persons_yolo(self, frame: np.ndarray, timestamp: float):
+        if asyncio.get_running_loop().time() < self.person_cooldown_end: return
+        # Движение найдено: только теперь копируем кадр из слота кольца в свой буфер анализа
+        frame = await asyncio.get_running_loop().run_in_executor(_INFER_POOL, self._copy_analysis_frame, frame, timestamp)
+        if frame is None:
+            return
+        H, W = frame.shape[:2]
+        # _gpu_frame уже содержит этот кадр: его загрузил _detect_motion_gpu
+        blob = await asyncio.get_running_loop().run_in_executor(
+            _INFER_POOL, PersonDetector.make_blob, frame if self._gpu_frame is None else self._gpu_frame, self._yolo_blob)
+        layer_outputs = await yolo_service.detect(blob)
+        person_class_id = yolo_service.detector.person_class_id
+        # Постобработка векторно по всем строкам сразу, без Python-цикла по ~2.5 тыс. детекций
+        detections = np.vstack(layer_outputs)
+        scores = detections[:, 5:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(scores)), class_ids]
+        mask = (class_ids == person_class_id) & (confidences > settings.YOLO_CONFIDENCE_THRESHOLD)
+        centers = (detections[mask, :4] * np.array([W, H, W, H])).astype("int")
+        corners = (centers[:, :2] - centers[:, 2:] / 2).astype("int")
+        boxes = np.hstack([corners, centers[:, 2:]]).tolist()
+        confidences = confidences[mask].tolist()
         idxs = cv2.dnn.NMSBoxes(boxes, confidences, settings.YOLO_CONFIDENCE_THRESHOLD, 0.4)
         if len(idxs) > 0:
-            self.person_cooldown_end = time.time() + settings.PERSON_COOLDOWN_SECONDS
+            self.person_cooldown_end = asyncio.get_running_loop().time() + settings.PERSON_COOLDOWN_SECONDS
+            frame_key = None
+            # frame - буфер анализа этого воркера, а не слот кольца: рамки рисуем прямо на нем,
+            # следующий кадр попадет туда только после того, как этот снимок закодирован
             for i in idxs.flatten():
                 (x, y, w, h) = boxes[i]
                 cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
                 text = f"Person: {confidences[i]:.2f}"
                 cv2.putText(frame, text, (x, y - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-            temp_filename = f"{uuid.uuid4()}.jpg"
-            temp_filepath = os.path.join(TEMP_FRAME_DIR, temp_filename)
-            await asyncio.to_thread(cv2.imwrite, temp_filepath, frame)
-            await redis_publisher.publish(
+            # Кадр кодируем в памяти и кладем в Redis: подписчикам не нужна общая с нами файловая система
+            jpeg = await asyncio.get_running_loop().run_in_executor(_ENCODE_POOL, image_encoder.encode, frame)
+            if jpeg is not None:
+                frame_key = f"frame:{uuid.uuid4()}"
+                await redis_publisher.store_frame(frame_key, jpeg, settings.DETECTION_FRAME_TTL)
+            redis_publisher.publish(
                 channel=f"camera:{self.camera_id}", event_type="person.detected",
-                data={"camera_id": self.camera_id, "timestamp": time.time(), "person_count": len(idxs), "frame_path": temp_filepath})
+                data={"camera_id": self.camera_id, "timestamp": timestamp, "person_count": len(idxs), "frame_key": frame_key})
             print(f"YOLO confidently found {len(idxs)} person(s) on {self.camera_id}, event published.")
 
-    def get_latest_frame_jpeg(self) -> Optional[bytes]:
-        latest_item = self.buffer.get_latest()
-        if latest_item is None: return None
-        frame, _ = latest_item
-        ret, jpeg = cv2.imencode('.jpg', frame)
-        return jpeg.tobytes() if ret else None
+    @property
+    def frame_etag(self) -> str:
+        """Слабый ETag последнего кадра: меняется с каждым новым кадром и при пересоздании воркера."""
+        return f'W/"{id(self):x}-{self._frame_seq}"'
+
+    async def get_latest_frame_jpeg(self) -> Optional[bytes]:
+        # Кодируем лениво, в пуле потоков и не больше одного раза на кадр: все клиенты делят результат
+        if self._latest_jpeg_seq == self._frame_seq:
+            return self._latest_jpeg
+        seq = self._frame_seq
+        if self._jpeg_future is None or self._jpeg_future_seq != seq:
+            latest_item = self.buffer.get_latest()
+            if latest_item is None: return None
+            frame, _ = latest_item
+            self._jpeg_future = asyncio.get_running_loop().run_in_executor(_ENCODE_POOL, image_encoder.encode, frame)
+            self._jpeg_future_seq = seq
+        # shield: отмена одного клиента не должна отменять кодирование для остальных
+        jpeg = await asyncio.shield(self._jpeg_future)
+        if jpeg is not None and self._latest_jpeg_seq < seq:
+            self._latest_jpeg = jpeg
+            self._latest_jpeg_seq = seq
+        return jpeg
 
     async def get_mjpeg_stream_generator(self):
-        last_frame_time = 0
+        last_seq = 0
         while self.is_running:
             try:
-                latest_item = self.buffer.get_latest()
-                if latest_item:
-                    frame, timestamp = latest_item
-                    if timestamp > last_frame_time:
-                        last_frame_time = timestamp
-                        ret, jpeg = cv2.imencode('.jpg', frame)
-                        if ret:
-                            frame_bytes = jpeg.tobytes()
-                            yield (b'--frame\r\n'
-                                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                await asyncio.sleep(1/30)
+                if self._frame_seq == last_seq:
+                    # Ждем новый кадр; таймаут нужен, чтобы заметить остановку воркера
+                    try: await asyncio.wait_for(self._new_frame.wait(), timeout=1.0)
+                    except asyncio.TimeoutError: pass
+                    continue
+                last_seq = self._frame_seq
+                jpeg = await self.get_latest_frame_jpeg()
+                if jpeg:
+                    # Часть собирается одной аллокацией и уходит одним ASGI send на кадр
+                    yield _MJPEG_PART % (len(jpeg), jpeg)
             except asyncio.CancelledError:
                 print(f"MJPEG stream for {self.camera_id} cancelled.")
                 break
@@ -251,34 +471,81 @@ class CameraWorker:
 # --- Функции управления (без изменений) ---
 async def start_worker(camera_id: str, source_type: str, source_url: Optional[str] = None):
     if camera_id in worker_store: await stop_worker(camera_id)
-    if source_type in ["rtsp", "mjpeg"] and source_url:
-        worker = CameraWorker(camera_id, source_url)
-        worker.source_type = source_type
+    if settings.ENABLE_PERSON_DETECTION:
+        # Первая камера загружает модель (вне цикла событий), остальные получают уже готовую
+        detector = await yolo_service.get_detector()
+        print(f"YOLOv4-tiny person detector ready for worker {camera_id} ({detector.backend_name}).")
+    if source_type in _STREAMABLE and source_url:
+        worker = CameraWorker(camera_id, source_url, source_type)
         worker_store[camera_id] = worker
         await worker.start()
     elif source_type == "http_push":
-        worker = CameraWorker(camera_id, "")
-        worker.source_type = "http_push"
+        worker = CameraWorker(camera_id, "", "http_push")
         worker.is_running = True
         worker_store[camera_id] = worker
         update_camera_status(camera_id, True)
         print(f"Push worker {camera_id} initialized.")
+    _sync_registry(camera_id)
 
 async def stop_worker(camera_id: str):
     if camera_id in worker_store:
         await worker_store[camera_id].stop()
         del worker_store[camera_id]
+        _sync_registry(camera_id)
 
 def get_worker(camera_id: str) -> Optional[CameraWorker]:
     return worker_store.get(camera_id)
 
+def get_all_workers() -> Dict[str, CameraWorker]:
+    return worker_store
+
+def get_camera_and_worker(camera_id: str) -> Tuple[Optional[Camera], Optional[CameraWorker]]:
+    return registry_store.get(camera_id, (None, None))
+
 def get_all_cameras() -> Dict[str, Camera]:
     return camera_store
 
+def get_registry_etag() -> str:
+    return f'W/"{_BOOT_ID}-{_registry_version}"'
+
+def get_event_channels() -> Set[str]:
+    """Каналы Redis, в которые публикуют события зарегистрированные камеры."""
+    return {f"camera:{camera_id}" for camera_id in camera_store}
+
+def add_camera_set_listener(callback: Callable[[], None]):
+    _camera_set_listeners.append(callback)
+
+def remove_camera_set_listener(callback: Callable[[], None]):
+    _camera_set_listeners.remove(callback)
+
+def _notify_camera_set_changed():
+    for callback in _camera_set_listeners:
+        callback()
+
+def _sync_registry(camera_id: str):
+    global _registry_version
+    camera = camera_store.get(camera_id)
+    if camera is None:
+        registry_store.pop(camera_id, None)
+    else:
+        registry_store[camera_id] = (camera, worker_store.get(camera_id))
+    _registry_version += 1
+
+def _set_camera_status(camera_id: str, status: str):
+    global _registry_version
+    camera = camera_store.get(camera_id)
+    if camera is not None and camera.status != status:
+        camera.status = status
+        _registry_version += 1
+
 async def register_camera(camera: Camera, save_to_db: bool = True):
-    if camera.id in camera_store: await stop_worker(camera.id)
+    is_new = camera.id not in camera_store
+    if not is_new: await stop_worker(camera.id)
     camera_store[camera.id] = camera
-    if camera.source_type in ["rtsp", "mjpeg"] and camera.source_url:
+    _sync_registry(camera.id)
+    # Уведомляем до запуска воркера, чтобы слушатели успели подписаться на его первые события
+    if is_new: _notify_camera_set_changed()
+    if camera.source_type in _STREAMABLE and camera.source_url:
         await start_worker(camera.id, camera.source_type, camera.source_url)
     elif camera.source_type == "http_push":
         await start_worker(camera.id, camera.source_type)
@@ -290,15 +557,20 @@ async def unregister_camera(camera_id: str):
     update_camera_status(camera_id, False)
     if camera_id in camera_store:
         del camera_store[camera_id]
+        _sync_registry(camera_id)
+        _notify_camera_set_changed()
         _save_cameras_to_db()
         return True
     return False
 
 def _save_cameras_to_db():
     try:
-        cameras_dict = {cam_id: cam.model_dump() for cam_id, cam in camera_store.items()}
-        with open(settings.CAMERA_DB_FILE, 'w') as f:
-            json.dump(cameras_dict, f, indent=4)
+        cameras_dict = {cam_id: cam.model_dump(mode="json", exclude_none=True) for cam_id, cam in camera_store.items()}
+        # Пишем во временный файл и атомарно подменяем, чтобы не оставить битый JSON при сбое
+        tmp_path = f"{settings.CAMERA_DB_FILE}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(cameras_dict, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, settings.CAMERA_DB_FILE)
     except Exception as e:
         print(f"Error saving cameras to DB: {e}")
 
@@ -307,8 +579,8 @@ async def load_cameras_from_db():
         if not os.path.exists(settings.CAMERA_DB_FILE):
             print("Camera DB file not found, starting with empty list.")
             return
-        with open(settings.CAMERA_DB_FILE, 'r') as f:
-            cameras_data = json.load(f)
+        with open(settings.CAMERA_DB_FILE, 'rb') as f:
+            cameras_data = orjson.loads(f.read())
         print(f"Loading {len(cameras_data)} cameras from DB...")
         tasks = [register_camera(Camera(**cam_data), save_to_db=False) for cam_data in cameras_data.values()]
         await asyncio.gather(*tasks)
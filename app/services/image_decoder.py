@@ -0,0 +1,90 @@
+import io
+import cv2
+import numpy as np
+from PIL import Image
+from typing import Optional, Dict, Type, Union
+
+from app.core.config import settings
+
+# Декодеры принимают любой объект с buffer protocol, чтобы не копировать загруженные данные
+JpegBuffer = Union[bytes, bytearray, memoryview]
+
+
+class ImageDecoder:
+    """Базовый декодер: JPEG-байты -> BGR np.ndarray (или None, если кадр битый)."""
+    def decode(self, data: JpegBuffer) -> Optional[np.ndarray]:
+        raise NotImplementedError
+
+
+class OpenCVDecoder(ImageDecoder):
+    """Декодирование через cv2.imdecode."""
+    def decode(self, data: JpegBuffer) -> Optional[np.ndarray]:
+        return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+class TurboJpegDecoder(ImageDecoder):
+    """libjpeg-turbo напрямую: SIMD-декодирование сразу в BGR, без перестановок каналов OpenCV."""
+    def __init__(self):
+        from turbojpeg import TurboJPEG, TJPF_BGR
+        self._tj = TurboJPEG()
+        self._pixel_format = TJPF_BGR
+
+    def decode(self, data: JpegBuffer) -> Optional[np.ndarray]:
+        try:
+            return self._tj.decode(data, pixel_format=self._pixel_format)
+        except OSError:
+            return None
+
+
+class PillowDecoder(ImageDecoder):
+    """Декодирование через Pillow (в сборке Pillow-SIMD - с AVX2); запасной вариант без libturbojpeg."""
+    def decode(self, data: JpegBuffer) -> Optional[np.ndarray]:
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                if img.mode != "RGB":
+                    img = img.convert("RGB")
+                rgb = np.asarray(img)
+        except OSError:
+            return None
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR)
+
+
+class NvJpegDecoder(ImageDecoder):
+    """Аппаратное декодирование на GPU через nvJPEG (пакет PyNvJpeg)."""
+    def __init__(self):
+        from nvjpeg import NvJpeg
+        self._nj = NvJpeg()
+
+    def decode(self, data: JpegBuffer) -> Optional[np.ndarray]:
+        try:
+            return self._nj.decode(data)
+        except Exception:
+            return None
+
+
+_DECODERS: Dict[str, Type[ImageDecoder]] = {
+    "opencv": OpenCVDecoder,
+    "turbojpeg": TurboJpegDecoder,
+    "pillow": PillowDecoder,
+    "nvjpeg": NvJpegDecoder,
+}
+
+
+# Порядок отката, если выбранный бэкенд недоступен; OpenCV есть всегда
+_FALLBACK_ORDER = ("nvjpeg", "turbojpeg", "pillow", "opencv")
+
+
+def create_image_decoder(backend: str) -> ImageDecoder:
+    """Создает декодер выбранного бэкенда; если он недоступен - берет следующий по _FALLBACK_ORDER."""
+    for name in _FALLBACK_ORDER[_FALLBACK_ORDER.index(backend):]:
+        try:
+            decoder = _DECODERS[name]()
+        except (ImportError, OSError, RuntimeError) as e:
+            print(f"JPEG decoder '{name}' is unavailable ({e}), trying the next one.")
+            continue
+        print(f"JPEG decoder initialized: {name}")
+        return decoder
+    return OpenCVDecoder()
+
+
+image_decoder = create_image_decoder(settings.JPEG_DECODER)
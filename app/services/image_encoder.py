@@ -0,0 +1,86 @@
+import threading
+import cv2
+import numpy as np
+from typing import Optional, Dict, Type
+
+from app.core.config import settings
+
+
+class ImageEncoder:
+    """Базовый кодировщик: BGR np.ndarray -> JPEG-байты (или None при ошибке)."""
+    def __init__(self, quality: int):
+        self.quality = quality
+
+    def encode(self, frame: np.ndarray) -> Optional[bytes]:
+        raise NotImplementedError
+
+
+class OpenCVEncoder(ImageEncoder):
+    """Кодирование через cv2.imencode."""
+    def __init__(self, quality: int):
+        super().__init__(quality)
+        self._params = [cv2.IMWRITE_JPEG_QUALITY, quality]
+
+    def encode(self, frame: np.ndarray) -> Optional[bytes]:
+        ret, jpeg = cv2.imencode('.jpg', frame, self._params)
+        return jpeg.tobytes() if ret else None
+
+
+class TurboJpegEncoder(ImageEncoder):
+    """libjpeg-turbo напрямую: SIMD DCT и Хаффман, BGR на входе без конвертации."""
+    def __init__(self, quality: int):
+        super().__init__(quality)
+        from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+        self._tj = TurboJPEG()
+        self._pixel_format = TJPF_BGR
+        self._subsample = TJSAMP_420
+
+    def encode(self, frame: np.ndarray) -> Optional[bytes]:
+        try:
+            return self._tj.encode(frame, quality=self.quality, pixel_format=self._pixel_format,
+                                   jpeg_subsample=self._subsample)
+        except OSError:
+            return None
+
+
+class NvJpegEncoder(ImageEncoder):
+    """Аппаратное кодирование на GPU через nvJPEG (пакет PyNvJpeg)."""
+    def __init__(self, quality: int):
+        super().__init__(quality)
+        from nvjpeg import NvJpeg
+        self._nj = NvJpeg()
+        # Один nvJPEG-хэндл на процесс: вызовы из пула потоков сериализуем
+        self._lock = threading.Lock()
+
+    def encode(self, frame: np.ndarray) -> Optional[bytes]:
+        try:
+            with self._lock:
+                return self._nj.encode(frame, self.quality)
+        except Exception:
+            return None
+
+
+_ENCODERS: Dict[str, Type[ImageEncoder]] = {
+    "opencv": OpenCVEncoder,
+    "turbojpeg": TurboJpegEncoder,
+    "nvjpeg": NvJpegEncoder,
+}
+
+# Порядок отката, если выбранный бэкенд недоступен; OpenCV есть всегда
+_FALLBACK_ORDER = ("nvjpeg", "turbojpeg", "opencv")
+
+
+def create_image_encoder(backend: str, quality: int) -> ImageEncoder:
+    """Создает кодировщик выбранного бэкенда; если он недоступен - берет следующий по _FALLBACK_ORDER."""
+    for name in _FALLBACK_ORDER[_FALLBACK_ORDER.index(backend):]:
+        try:
+            encoder = _ENCODERS[name](quality)
+        except (ImportError, OSError, RuntimeError) as e:
+            print(f"JPEG encoder '{name}' is unavailable ({e}), trying the next one.")
+            continue
+        print(f"JPEG encoder initialized: {name}")
+        return encoder
+    return OpenCVEncoder(quality)
+
+
+image_encoder = create_image_encoder(settings.JPEG_ENCODER, settings.JPEG_QUALITY)
@@ -1,5 +1,5 @@
 from prometheus_client import Gauge, Counter, generate_latest
-from typing import Dict
+from typing import Dict, Tuple
 
 # Define Prometheus metrics
 # Gauge for the current status of each camera (0=disconnected, 1=connected)
@@ -30,21 +30,51 @@ LAST_FRAME_TIMESTAMP = Gauge(
     ['camera_id']
 )
 
+# Counter for events dropped because the Redis publish queue was full
+REDIS_EVENTS_DROPPED_TOTAL = Counter(
+    'camera_ingest_redis_events_dropped_total',
+    'Total number of events dropped because the Redis publish queue was full'
+)
+
+# Cached labelled children: .labels() builds a key tuple and takes a lock on every call,
+# and the frame counters are updated for every ingested frame
+_camera_status: Dict[str, Gauge] = {}
+_frames_ingested: Dict[Tuple[str, str], Counter] = {}
+_motion_detected: Dict[str, Counter] = {}
+_last_frame_timestamp: Dict[str, Gauge] = {}
+
 def update_camera_status(camera_id: str, is_connected: bool):
     """Updates the camera connection status gauge."""
-    CAMERA_STATUS.labels(camera_id=camera_id).set(1 if is_connected else 0)
+    child = _camera_status.get(camera_id)
+    if child is None:
+        child = _camera_status[camera_id] = CAMERA_STATUS.labels(camera_id=camera_id)
+    child.set(1 if is_connected else 0)
 
 def increment_frames_ingested(camera_id: str, source_type: str):
     """Increments the total frames ingested counter."""
-    FRAMES_INGESTED_TOTAL.labels(camera_id=camera_id, source_type=source_type).inc()
+    child = _frames_ingested.get((camera_id, source_type))
+    if child is None:
+        child = _frames_ingested[camera_id, source_type] = FRAMES_INGESTED_TOTAL.labels(
+            camera_id=camera_id, source_type=source_type)
+    child.inc()
 
 def increment_motion_detected(camera_id: str):
     """Increments the motion detected counter."""
-    MOTION_DETECTED_TOTAL.labels(camera_id=camera_id).inc()
+    child = _motion_detected.get(camera_id)
+    if child is None:
+        child = _motion_detected[camera_id] = MOTION_DETECTED_TOTAL.labels(camera_id=camera_id)
+    child.inc()
 
 def update_last_frame_timestamp(camera_id: str, timestamp: float):
     """Updates the timestamp of the last received frame."""
-    LAST_FRAME_TIMESTAMP.labels(camera_id=camera_id).set(timestamp)
+    child = _last_frame_timestamp.get(camera_id)
+    if child is None:
+        child = _last_frame_timestamp[camera_id] = LAST_FRAME_TIMESTAMP.labels(camera_id=camera_id)
+    child.set(timestamp)
+
+def increment_redis_events_dropped():
+    """Increments the dropped Redis events counter."""
+    REDIS_EVENTS_DROPPED_TOTAL.inc()
 
 def get_metrics() -> bytes:
     """Generates the latest Prometheus metrics in text format."""
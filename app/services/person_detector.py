@@ -0,0 +1,233 @@
+import asyncio
+import cv2
+import numpy as np
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple, Union
+
+from app.core.config import settings
+
+# --- Папка с весами и конфигами моделей ---
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / "models"
+
+YOLO_INPUT_SIZE = (416, 416)
+
+_BLOB_SCALE = np.float32(1 / 255.0)
+
+# Кадр на хосте или уже загруженный на GPU (при CUDA воркер загружает кадр один раз для движения и YOLO)
+DetectorInput = Union[np.ndarray, cv2.cuda_GpuMat]
+
+
+def _cuda_device_count() -> int:
+    try:
+        return cv2.cuda.getCudaEnabledDeviceCount()
+    except cv2.error:
+        return 0
+
+# YOLO идет на GPU (CUDA, FP16), если OpenCV собран с CUDA и видит устройство; иначе - на CPU
+CUDA_AVAILABLE = _cuda_device_count() > 0
+
+
+class PersonDetector:
+    """
+    Базовый детектор: батч блобов Nx3x416x416 -> для каждого кадра выходы YOLO в формате Darknet
+    (строки cx, cy, w, h в долях кадра, objectness, вероятности классов).
+    """
+    backend_name = ""
+    max_batch = 1
+
+    def __init__(self):
+        with open(MODELS_DIR / "coco.names", "r") as f:
+            self.class_names = [line.strip() for line in f.readlines()]
+        self.person_class_id = self.class_names.index('person')
+
+    def infer_batch(self, blobs: np.ndarray) -> List[List[np.ndarray]]:
+        raise NotImplementedError
+
+    @staticmethod
+    def make_blob(frame: DetectorInput, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        То же, что blobFromImage(frame, 1/255, 416x416, swapRB=True), но в заранее выделенный
+        блоб out (1x3x416x416 float32), чтобы не аллоцировать 2 МБ на каждый запуск.
+        """
+        if out is None:
+            out = np.empty((1, 3, *YOLO_INPUT_SIZE[::-1]), dtype=np.float32)
+        if isinstance(frame, cv2.cuda_GpuMat):
+            # Ресайз, BGR->RGB и масштаб 1/255 на GPU; на хост уходит уже готовый 416x416 float32
+            resized = cv2.cuda.resize(frame, YOLO_INPUT_SIZE)
+            rgb = cv2.cuda.cvtColor(resized, cv2.COLOR_BGR2RGB).convertTo(cv2.CV_32F, alpha=1 / 255.0)
+            np.copyto(out[0], rgb.download().transpose(2, 0, 1))
+            return out
+        resized = cv2.resize(frame, YOLO_INPUT_SIZE)
+        # BGR->RGB и HWC->CHW - перестановкой осей без копии; масштаб пишется сразу в out
+        np.multiply(resized[..., ::-1].transpose(2, 0, 1), _BLOB_SCALE, out=out[0])
+        return out
+
+
+class OpenCVYoloDetector(PersonDetector):
+    """YOLOv4-tiny через OpenCV DNN: CUDA FP16, если есть GPU, иначе CPU."""
+    def __init__(self):
+        super().__init__()
+        self.net = cv2.dnn.readNetFromDarknet(str(MODELS_DIR / "yolov4-tiny.cfg"), str(MODELS_DIR / "yolov4-tiny.weights"))
+        self.max_batch = settings.YOLO_MAX_BATCH
+        if CUDA_AVAILABLE:
+            self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA_FP16)
+            self.backend_name = "OpenCV DNN, CUDA FP16"
+        else:
+            self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+            self.backend_name = "OpenCV DNN, CPU"
+
+        layer_names = self.net.getLayerNames()
+        self.output_layers = [layer_names[i - 1] for i in self.net.getUnconnectedOutLayers().flatten()]
+        # Прогревочный forward: инициализация бэкенда (CUDA-контекст, выделение памяти) ленивая
+        # и иначе ложится на первое реальное срабатывание детектора
+        self.net.setInput(np.zeros((1, 3, *YOLO_INPUT_SIZE), dtype=np.float32))
+        self.net.forward(self.output_layers)
+
+    def infer_batch(self, blobs: np.ndarray) -> List[List[np.ndarray]]:
+        self.net.setInput(blobs)
+        layer_outputs = self.net.forward(self.output_layers)
+        # Для батча из одного кадра OpenCV отдает 2D-выходы (строки x 85), для большего - 3D (N x строки x 85)
+        if layer_outputs[0].ndim == 2:
+            return [list(layer_outputs)]
+        return [[output[i] for output in layer_outputs] for i in range(len(blobs))]
+
+
+class TensorRTYoloDetector(PersonDetector):
+    """
+    YOLOv4-tiny как FP16-движок TensorRT (trtexec --fp16 --saveEngine=...).
+    Движок должен принимать Bx3x416x416 float32 и отдавать строки в формате Darknet;
+    B берется из формы входа движка и ограничивает размер батча.
+    """
+    def __init__(self, engine_path: Path):
+        super().__init__()
+        import tensorrt as trt
+        import pycuda.driver as cuda
+
+        cuda.init()
+        # Свой CUDA-контекст: infer вызывается из пула потоков, и контекст нужно делать текущим в каждом потоке
+        self._ctx = cuda.Device(0).make_context()
+        try:
+            with open(engine_path, "rb") as f:
+                runtime = trt.Runtime(trt.Logger(trt.Logger.WARNING))
+                self._engine = runtime.deserialize_cuda_engine(f.read())
+            if self._engine is None:
+                raise RuntimeError(f"Failed to deserialize TensorRT engine {engine_path}")
+            self._context = self._engine.create_execution_context()
+            self._stream = cuda.Stream()
+
+            # Page-locked буферы на хосте и буферы на устройстве выделяются один раз
+            self._inputs, self._outputs = [], []
+            for i in range(self._engine.num_io_tensors):
+                name = self._engine.get_tensor_name(i)
+                shape = tuple(self._engine.get_tensor_shape(name))
+                dtype = trt.nptype(self._engine.get_tensor_dtype(name))
+                host = cuda.pagelocked_empty(shape, dtype)
+                device = cuda.mem_alloc(host.nbytes)
+                self._context.set_tensor_address(name, int(device))
+                if self._engine.get_tensor_mode(name) == trt.TensorIOMode.INPUT:
+                    self._inputs.append((host, device))
+                else:
+                    self._outputs.append((host, device))
+        finally:
+            self._ctx.pop()
+        self._cuda = cuda
+        self.backend_name = "TensorRT FP16"
+        self.max_batch = self._inputs[0][0].shape[0]
+
+    def infer_batch(self, blobs: np.ndarray) -> List[List[np.ndarray]]:
+        input_host, input_device = self._inputs[0]
+        n = len(blobs)
+        input_host[:n] = blobs
+
+        self._ctx.push()
+        try:
+            self._cuda.memcpy_htod_async(input_device, input_host, self._stream)
+            self._context.execute_async_v3(self._stream.handle)
+            for host, device in self._outputs:
+                self._cuda.memcpy_dtoh_async(host, device, self._stream)
+            self._stream.synchronize()
+        finally:
+            self._ctx.pop()
+        # Копируем: page-locked буферы перезапишет следующий вызов
+        outputs = [host.reshape(self.max_batch, -1, host.shape[-1])[:n].copy() for host, _ in self._outputs]
+        return [[output[i] for output in outputs] for i in range(n)]
+
+
+def create_person_detector() -> PersonDetector:
+    """TensorRT, если задан YOLO_TRT_ENGINE и он загружается; иначе OpenCV DNN."""
+    if settings.YOLO_TRT_ENGINE:
+        try:
+            return TensorRTYoloDetector(MODELS_DIR / settings.YOLO_TRT_ENGINE)
+        except Exception as e:
+            print(f"TensorRT engine '{settings.YOLO_TRT_ENGINE}' is unavailable ({e}), falling back to OpenCV DNN.")
+    return OpenCVYoloDetector()
+
+
+class YoloService:
+    """
+    Общий YOLO для всех камер. Запросы воркеров копятся до YOLO_MAX_BATCH штук или YOLO_BATCH_WAIT_MS
+    и идут одним forward: фиксированная стоимость запуска сети делится на весь батч.
+    """
+    def __init__(self, max_wait: float):
+        self.max_wait = max_wait
+        self.detector: Optional[PersonDetector] = None
+        self._load_lock = asyncio.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # Батч собирается в один постоянный буфер: следующий батч строится только после forward предыдущего
+        self._batch: Optional[np.ndarray] = None
+        # Сеть не потокобезопасна: все forward идут в одном потоке
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="yolo")
+
+    async def get_detector(self) -> PersonDetector:
+        """Один детектор на процесс; загружается при первом вызове, в отдельном потоке, чтобы не блокировать цикл."""
+        if self.detector is None:
+            async with self._load_lock:
+                if self.detector is None:
+                    self.detector = await asyncio.get_running_loop().run_in_executor(self._executor, create_person_detector)
+        return self.detector
+
+    async def detect(self, blob: np.ndarray) -> List[np.ndarray]:
+        """Ставит блоб 1x3x416x416 в очередь и ждет выходы YOLO для него."""
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run(), name="YoloService")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((blob, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        detector = await self.get_detector()
+        while True:
+            batch: List[Tuple[np.ndarray, asyncio.Future]] = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < detector.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Воркер мог быть остановлен, пока его запрос ждал в очереди
+            batch = [(blob, future) for blob, future in batch if not future.done()]
+            if not batch:
+                continue
+            if self._batch is None:
+                self._batch = np.empty((detector.max_batch, 3, *YOLO_INPUT_SIZE[::-1]), dtype=np.float32)
+            blobs = np.concatenate([blob for blob, _ in batch], out=self._batch[:len(batch)])
+            try:
+                results = await loop.run_in_executor(self._executor, detector.infer_batch, blobs)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done(): future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done(): future.set_result(result)
+
+
+yolo_service = YoloService(settings.YOLO_BATCH_WAIT_MS / 1000)
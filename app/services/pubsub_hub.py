@@ -0,0 +1,102 @@
+import asyncio
+import logging
+from typing import AsyncIterator, List, Optional, Set, Tuple
+
+from app.services.redis_publisher import redis_publisher
+from app.services.camera_worker import get_event_channels, add_camera_set_listener, remove_camera_set_listener
+
+logger = logging.getLogger(__name__)
+
+
+class PubSubHub:
+    """
+    Одна подписка Redis на процесс: одна задача читает события из каналов camera:<id> и раздает их
+    всем слушателям (вебсокеты, Telegram) через их очереди, вместо своего pubsub-соединения у каждого.
+    Подписка точная (SUBSCRIBE), а не по шаблону camera:*: Redis не сверяет каждую публикацию
+    с шаблонами подписчиков. При добавлении и удалении камер подписки обновляются на лету.
+    """
+    # Сколько событий может ждать медленного слушателя; сверх этого выбрасываются самые старые
+    QUEUE_SIZE: int = 1000
+
+    def __init__(self):
+        self._queues: List[asyncio.Queue] = []
+        self._reader: Optional[asyncio.Task] = None
+
+    async def listen(self) -> AsyncIterator[Tuple[bytes, bytes]]:
+        """
+        Отдает пары (канал, событие в JSON), оба в bytes; первый слушатель запускает чтение из Redis,
+        последний - останавливает.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+        self._queues.append(queue)
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._run(), name="PubSubHub")
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._queues.remove(queue)
+            if not self._queues and self._reader is not None:
+                self._reader.cancel()
+                self._reader = None
+
+    def _dispatch(self, data: Tuple[bytes, bytes]):
+        for queue in self._queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    async def _run(self):
+        while True:
+            try:
+                await self._read()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Соединение с Redis потеряно: переподключаемся и подписываемся заново
+                logger.warning("PubSubHub lost the Redis connection (%s), reconnecting in 1s.", e)
+                await asyncio.sleep(1)
+
+    async def _read(self):
+        pubsub = redis_publisher.r.pubsub(ignore_subscribe_messages=True)
+        changed = asyncio.Event()
+        has_channels = asyncio.Event()
+
+        async def follow_cameras():
+            # SUBSCRIBE/UNSUBSCRIBE только отправляются; подтверждения разбирает listen() ниже
+            subscribed: Set[str] = set()
+            try:
+                while True:
+                    await changed.wait()
+                    changed.clear()
+                    wanted = get_event_channels()
+                    if wanted - subscribed:
+                        await pubsub.subscribe(*(wanted - subscribed))
+                    if subscribed - wanted:
+                        await pubsub.unsubscribe(*(subscribed - wanted))
+                    subscribed = wanted
+                    if wanted: has_channels.set()
+                    else: has_channels.clear()
+            finally:
+                # Если подписка упала (Redis недоступен), будим цикл чтения: он поднимет ошибку и переподключится
+                has_channels.set()
+
+        add_camera_set_listener(changed.set)
+        changed.set()
+        follower = asyncio.create_task(follow_cameras(), name="PubSubHub-subscriptions")
+        try:
+            while True:
+                # listen() завершается, когда не остается ни одной подписки: ждем новых камер
+                await has_channels.wait()
+                if follower.done():
+                    follower.result()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._dispatch((message["channel"], message["data"]))
+        finally:
+            remove_camera_set_listener(changed.set)
+            follower.cancel()
+            await pubsub.close()
+
+
+pubsub_hub = PubSubHub()
@@ -1,18 +1,105 @@
+import asyncio
 import redis.asyncio as redis
-import json
-from typing import Any
+import orjson
+from typing import Any, Dict, List, Optional, Tuple, Union
 from app.core.config import settings
+from app.services.metrics import increment_redis_events_dropped
+
+# Один пул соединений на процесс: все клиенты и подписки делят его сокеты, без нового TCP-соединения
+# на каждого; при исчерпании пула команда ждет свободное соединение, а не падает
+_pool = redis.BlockingConnectionPool(
+    host=settings.REDIS_HOST, port=settings.REDIS_PORT, max_connections=settings.REDIS_POOL_SIZE)
+
 
 class RedisPublisher:
+    # Сколько событий максимум уходит одним pipeline и сколько секунд копить пачку
+    MAX_BATCH: int = 256
+    FLUSH_WINDOW: float = 0.01
+
     def __init__(self):
         self.host = settings.REDIS_HOST
         self.port = settings.REDIS_PORT
-        self.r = redis.Redis(host=self.host, port=self.port, decode_responses=True)
+        # Без decode_responses: события уходят готовыми байтами, кадры хранятся как есть;
+        # подписчики получают data в bytes: вебсокеты пересылают их как есть, Telegram разбирает orjson.loads
+        self.r = redis.Redis(connection_pool=_pool)
+        # Сериализованное начало события для каждого event_type: b'{"event_type":"...","data":'
+        self._prefixes: Dict[str, bytes] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
         print(f"Async RedisPublisher initialized: {self.host}:{self.port}")
 
-    async def publish(self, channel: str, event_type: str, data: Any):
-        message = { "event_type": event_type, "data": data }
-        await self.r.publish(channel, json.dumps(message))
+    def publish(self, channel: str, event_type: str, data: Any):
+        """
+        Ставит событие в очередь и сразу возвращается; фоновая задача отправляет очередь пачками
+        через pipeline. Прием кадров не ждет Redis.
+        """
+        prefix = self._prefixes.get(event_type)
+        if prefix is None:
+            prefix = self._prefixes[event_type] = b'{"event_type":' + orjson.dumps(event_type) + b',"data":'
+        self._enqueue(channel, prefix + orjson.dumps(data) + b'}')
+
+    async def store_frame(self, key: str, jpeg: bytes, ttl: int):
+        """Кладет JPEG кадра в Redis на ttl секунд; в событии передается только ключ."""
+        await self.r.set(key, jpeg, ex=ttl)
+
+    async def take_frame(self, key: str) -> Optional[bytes]:
+        """Забирает и удаляет кадр одной командой; None, если ключ уже истек."""
+        return await self.r.getdel(key)
+
+    def publish_raw(self, channel: str, data: bytes):
+        """Ставит в очередь уже сериализованное событие (целиком, вместе с event_type)."""
+        self._enqueue(channel, data)
+
+    def _enqueue(self, channel: str, payload: Union[str, bytes]):
+        if self._flusher is None:
+            self._queue = asyncio.Queue(maxsize=settings.REDIS_QUEUE_SIZE)
+            self._flusher = asyncio.create_task(self._flush_loop(), name="RedisPublisher-flusher")
+        try:
+            self._queue.put_nowait((channel, payload))
+        except asyncio.QueueFull:
+            # Redis недоступен или не успевает: теряем событие, но не копим память и не тормозим кадры
+            increment_redis_events_dropped()
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.FLUSH_WINDOW
+            while len(batch) < self.MAX_BATCH:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._send(batch)
+
+    async def _send(self, batch: List[Tuple[str, Union[str, bytes]]]):
+        try:
+            async with self.r.pipeline(transaction=False) as pipe:
+                for channel, payload in batch:
+                    pipe.publish(channel, payload)
+                await pipe.execute()
+        except Exception as e:
+            print(f"Error publishing {len(batch)} event(s) to Redis: {e}")
+
+    async def close(self):
+        """Останавливает фоновую задачу и отправляет то, что осталось в очереди."""
+        if self._flusher is None:
+            return
+        self._flusher.cancel()
+        try: await self._flusher
+        except asyncio.CancelledError: pass
+        self._flusher = None
+        batch = []
+        while not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        if batch:
+            await self._send(batch)
 
 
-redis_publisher = RedisPublisher()
\ No newline at end of file
+redis_publisher = RedisPublisher()
@@ -1,19 +1,40 @@
-import os
 import asyncio
-import json
+import logging
+import orjson
 from aiogram import Bot
-from aiogram.types import BufferedInputFile
+from aiogram.types import BufferedInputFile, InputMediaPhoto
 from aiogram.exceptions import TelegramAPIError
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
-from app.services.redis_publisher import RedisPublisher
+from app.services.redis_publisher import redis_publisher
+from app.services.pubsub_hub import pubsub_hub
 # ИЗМЕНЕНИЕ: Импортируем наш объект настроек
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 # --- Глобальные переменные ---
 bot: Optional[Bot] = None
 # ИЗМЕНЕНИЕ: Убираем глобальные переменные отсюда, они теперь в settings
 telegram_listener_task: Optional[asyncio.Task] = None
+telegram_sender_task: Optional[asyncio.Task] = None
+
+# Неотправленные снимки: по одному, самому свежему, на камеру. Слушатель только кладет их сюда,
+# отправляет один telegram_sender, не чаще раза в SEND_INTERVAL секунд. Если кадра нет
+# (не сохранился или истек), вместо байтов None и уходит только текст
+_pending_frames: Dict[str, Tuple[Optional[bytes], str]] = {}
+_pending_event = asyncio.Event()
+# Все сообщения идут в один чат, а Telegram пропускает в чат около одного сообщения в секунду
+SEND_INTERVAL = 1.0
+# Сколько снимков максимум уходит одним альбомом (sendMediaGroup принимает от 2 до 10)
+MEDIA_GROUP_SIZE = 10
+
+# Подписи к снимкам по типу события; события других типов слушатель пропускает не разбирая
+TEMPLATES: Dict[str, str] = {
+    "person.detected": "🚨 *PERSON DETECTED* on Camera `{camera_id}`\n👥 People found: {person_count}",
+}
+# Начало сериализованного события каждого типа из TEMPLATES (так его пишет redis_publisher)
+_TEMPLATE_PREFIXES = tuple(b'{"event_type":' + orjson.dumps(event_type) for event_type in TEMPLATES)
 
 async def init_telegram_bot():
     """Инициализирует экземпляр бота Aiogram."""
@@ -26,12 +47,12 @@ async def init_telegram_bot():
         bot = Bot(token=token)
         try:
             await bot.get_me()
-            print("Telegram Bot initialized successfully (aiogram).")
+            logger.info("Telegram Bot initialized successfully (aiogram).")
         except TelegramAPIError as e:
-            print(f"Failed to initialize Telegram Bot: {e}")
+            logger.warning("Failed to initialize Telegram Bot: %s", e)
             bot = None
     else:
-        print("TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID not found in settings. Telegram notifications disabled.")
+        logger.info("TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID not found in settings. Telegram notifications disabled.")
 
 async def send_telegram_notification(message: str):
     """Отправляет текстовое сообщение в Telegram."""
@@ -39,7 +60,7 @@ async def send_telegram_notification(message: str):
     try:
         await bot.send_message(chat_id=settings.TELEGRAM_CHAT_ID, text=message, parse_mode='Markdown')
     except TelegramAPIError as e:
-        print(f"Error sending Telegram message: {e}")
+        logger.warning("Error sending Telegram message: %s", e)
 
 async def send_frame_with_people(frame_bytes: bytes, caption: str):
     """Отправляет кадр (в виде байтов) как фотографию с подписью."""
@@ -47,49 +68,80 @@ async def send_frame_with_people(frame_bytes: bytes, caption: str):
     try:
         photo = BufferedInputFile(frame_bytes, filename="detected_frame.jpg")
         await bot.send_photo(chat_id=settings.TELEGRAM_CHAT_ID, photo=photo, caption=caption)
-        print(f"Sent frame with detected people to Telegram chat {settings.TELEGRAM_CHAT_ID}")
+        logger.info("Sent frame with detected people to Telegram chat %s", settings.TELEGRAM_CHAT_ID)
+    except TelegramAPIError as e:
+        logger.warning("Error sending frame to Telegram: %s", e)
+
+async def send_frames_with_people(frames: List[Tuple[bytes, str]]):
+    """Отправляет несколько кадров одним альбомом (одно сообщение вместо нескольких)."""
+    if not bot: return
+    try:
+        media = [InputMediaPhoto(media=BufferedInputFile(frame_bytes, filename=f"detected_frame_{i}.jpg"), caption=caption)
+                 for i, (frame_bytes, caption) in enumerate(frames)]
+        await bot.send_media_group(chat_id=settings.TELEGRAM_CHAT_ID, media=media)
+        logger.info("Sent %d frames with detected people to Telegram chat %s", len(frames), settings.TELEGRAM_CHAT_ID)
     except TelegramAPIError as e:
-        print(f"Error sending frame to Telegram: {e}")
+        logger.warning("Error sending frames to Telegram: %s", e)
 
 # ... (telegram_event_listener остается без изменений) ...
 async def telegram_event_listener():
-    pubsub = None
     try:
-        redis_publisher = RedisPublisher()
-        pubsub = redis_publisher.r.pubsub()
-        await pubsub.psubscribe("camera:*")
-        print("Telegram listener (aiogram) started, subscribed to camera:*")
+        logger.info("Telegram listener (aiogram) started, subscribed to camera channels")
+
+        async for _, message in pubsub_hub.listen():
+            # Тип события виден по началу JSON: остальные события не разбираем вовсе
+            if not message.startswith(_TEMPLATE_PREFIXES):
+                continue
+            try:
+                data = orjson.loads(message)
+                event_data = data["data"]
+                camera_id = event_data.get("camera_id", "Unknown")
+                frame_key = event_data.get("frame_key")
 
-        async for message in pubsub.listen():
-            if message and message["type"] == "pmessage":
                 try:
-                    data = json.loads(message["data"])
-                    event_type = data.get("event_type")
-                    event_data = data.get("data", {})
-                    camera_id = event_data.get("camera_id", "Unknown")
-
-                    if event_type == "person.detected":
-                        frame_path = event_data.get("frame_path")
-                        person_count = event_data.get("person_count", 0)
-                        
-                        try:
-                            with open(frame_path, "rb") as f: frame_bytes = f.read()
-                            caption = f"🚨 *PERSON DETECTED* on Camera `{camera_id}`\n👥 People found: {person_count}"
-                            await send_frame_with_people(frame_bytes, caption)
-                            os.remove(frame_path)
-                        except Exception as e:
-                            print(f"Error handling person.detected event: {e}")
-
-                except json.JSONDecodeError:
-                    print(f"Failed to decode JSON message: {message['data']}")
+                    caption = TEMPLATES[data["event_type"]].format(**event_data)
+                    frame_bytes = await redis_publisher.take_frame(frame_key) if frame_key else None
+                    if frame_bytes is None:
+                        # Без снимка тревога все равно уходит, текстом
+                        logger.warning("Frame for %s on %s is missing or expired, sending text only.",
+                                       data["event_type"], camera_id)
+                    # Если снимок этой камеры еще не отправлен, заменяем его более свежим
+                    _pending_frames[camera_id] = (frame_bytes, caption)
+                    _pending_event.set()
                 except Exception as e:
-                    print(f"Error in Telegram listener processing: {e}")
+                    logger.warning("Error handling %s event: %s", data["event_type"], e)
+
+            except orjson.JSONDecodeError:
+                logger.warning("Failed to decode JSON message: %s", message)
+            except Exception as e:
+                logger.warning("Error in Telegram listener processing: %s", e)
 
     except asyncio.CancelledError:
-        print("Telegram listener task cancelled.")
+        logger.info("Telegram listener task cancelled.")
     finally:
-        if pubsub: await pubsub.close()
-        print("Telegram listener (aiogram) stopped.")
+        logger.info("Telegram listener (aiogram) stopped.")
+
+async def telegram_sender():
+    """
+    Отправляет накопленные снимки с паузой SEND_INTERVAL между сообщениями; если их накопилось
+    несколько, до MEDIA_GROUP_SIZE уходят одним альбомом. Тревоги без кадра уходят одним текстовым сообщением.
+    """
+    while True:
+        await _pending_event.wait()
+        _pending_event.clear()
+        while _pending_frames:
+            pending = [_pending_frames.pop(camera_id) for camera_id in list(_pending_frames)[:MEDIA_GROUP_SIZE]]
+            frames = [item for item in pending if item[0] is not None]
+            texts = [caption for frame_bytes, caption in pending if frame_bytes is None]
+            if texts:
+                await send_telegram_notification("\n\n".join(texts))
+                await asyncio.sleep(SEND_INTERVAL)
+            if len(frames) == 1:
+                await send_frame_with_people(*frames[0])
+            elif frames:
+                await send_frames_with_people(frames)
+            if frames:
+                await asyncio.sleep(SEND_INTERVAL)
 
 # ... (start/stop listener остаются без изменений) ...
 def start_telegram_listener():
@@ -97,16 +149,18 @@ def start_telegram_listener():
     async def startup():
         await init_telegram_bot()
         if bot:
-            global telegram_listener_task
+            global telegram_listener_task, telegram_sender_task
             telegram_listener_task = asyncio.create_task(telegram_event_listener())
+            telegram_sender_task = asyncio.create_task(telegram_sender())
     asyncio.create_task(startup())
 
 async def stop_telegram_listener():
     global telegram_listener_task
-    if telegram_listener_task:
-        telegram_listener_task.cancel()
-        try: await telegram_listener_task
-        except asyncio.CancelledError: pass
+    for task in (telegram_listener_task, telegram_sender_task):
+        if task:
+            task.cancel()
+            try: await task
+            except asyncio.CancelledError: pass
     if bot:
         await bot.session.close()
-        print("Telegram bot session closed.")
\ No newline at end of file
+        logger.info("Telegram bot session closed.")
\ No newline at end of file
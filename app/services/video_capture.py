@@ -0,0 +1,142 @@
+import cv2
+import numpy as np
+from typing import Optional, Tuple
+
+from app.core.config import settings
+
+
+class VideoCapture:
+    """
+    Базовый источник кадров потока: read() -> (ret, BGR np.ndarray) в духе cv2.VideoCapture.
+    Если передан out подходящей формы, кадр пишется в него, и возвращается он же. Сразу в out
+    декодирует только OpenCVCapture; PyAVCapture один раз копирует в out уже готовый BGR-кадр.
+    """
+    width: int = 0
+    height: int = 0
+    fps: float = 0.0
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        raise NotImplementedError
+
+    def grab(self) -> bool:
+        """Пропускает кадр: декодирует его (иначе сломаются следующие), но не переводит в BGR и не отдает."""
+        return self.read()[0]
+
+    def release(self) -> None:
+        raise NotImplementedError
+
+
+# VIDEO_HWACCEL -> режим аппаратного декодирования OpenCV; для cuda и прочих FFmpeg сам выбирает устройство
+_OPENCV_HWACCEL = {"vaapi": cv2.VIDEO_ACCELERATION_VAAPI}
+
+
+class OpenCVCapture(VideoCapture):
+    """
+    Чтение через cv2.VideoCapture (FFmpeg внутри OpenCV). С VIDEO_HWACCEL просит у FFmpeg аппаратный
+    декодер (NVDEC, VA-API); если его нет, OpenCV сам откатывается на программное декодирование.
+    """
+    def __init__(self, url: str):
+        params = []
+        if settings.VIDEO_HWACCEL:
+            params = [cv2.CAP_PROP_HW_ACCELERATION, _OPENCV_HWACCEL.get(settings.VIDEO_HWACCEL, cv2.VIDEO_ACCELERATION_ANY)]
+        self._cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, params)
+        if not self._cap.isOpened():
+            raise OSError(f"Failed to open stream: {url}")
+        self.width = int(self._cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self._cap.get(cv2.CAP_PROP_FPS)
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        # OpenCV декодирует прямо в переданный буфер, если совпадают размер и тип
+        return self._cap.read(out)
+
+    def grab(self) -> bool:
+        return self._cap.grab()
+
+    def release(self) -> None:
+        self._cap.release()
+
+
+class PyAVCapture(VideoCapture):
+    """
+    Чтение через PyAV: FFmpeg декодирует кадр в несколько потоков (thread_type AUTO = FRAME | SLICE),
+    а OpenCV по умолчанию декодирует в один. С VIDEO_HWACCEL (например, cuda) декодирует NVDEC.
+    В отличие от OpenCV, в переданный буфер не декодирует: PyAV не умеет переводить кадр в BGR
+    в чужой массив, поэтому read(out) - один проход копирования из кадра PyAV в слот.
+    """
+    # Сбрасывается в None, если аппаратное декодирование не поднялось, а программное - да
+    hwaccel: Optional[str] = settings.VIDEO_HWACCEL
+
+    def __init__(self, url: str):
+        import av
+        self._av_error = av.error.FFmpegError
+        options = {"fflags": "nobuffer"}
+        if url.startswith("rtsp"):
+            options["rtsp_transport"] = "tcp"
+        try:
+            self._container = self._open(url, options)
+        except self._av_error as e:
+            raise OSError(f"Failed to open stream: {e}") from e
+        stream = self._container.streams.video[0]
+        stream.thread_type = "AUTO"
+        self.width = stream.codec_context.width
+        self.height = stream.codec_context.height
+        self.fps = float(stream.average_rate or 0)
+        self._frames = self._container.decode(stream)
+
+    @classmethod
+    def _open(cls, url: str, options: dict):
+        import av
+        if cls.hwaccel is None:
+            return av.open(url, options=options, timeout=10)
+        from av.codec.hwaccel import HWAccel
+        try:
+            # Кадры декодируются на GPU; to_ndarray сам скачивает их в память хоста
+            return av.open(url, options=options, timeout=10, hwaccel=HWAccel(cls.hwaccel))
+        except av.error.FFmpegError as e:
+            container = av.open(url, options=options, timeout=10)
+            print(f"Hardware decoding '{cls.hwaccel}' is unavailable ({e}), using software decoding.")
+            PyAVCapture.hwaccel = None
+            return container
+
+    def read(self, out: Optional[np.ndarray] = None) -> Tuple[bool, Optional[np.ndarray]]:
+        try:
+            frame = next(self._frames)
+        except (StopIteration, self._av_error):
+            return False, None
+        # to_ndarray - вид на BGR-кадр, который PyAV выделил при переводе из YUV, а не еще одна копия
+        image = frame.to_ndarray(format="bgr24")
+        if out is None or out.shape != image.shape:
+            return True, image
+        # Единственная копия кадра - здесь, в потоке декодирования, а не в цикле событий
+        np.copyto(out, image)
+        return True, out
+
+    def grab(self) -> bool:
+        try:
+            next(self._frames)
+        except (StopIteration, self._av_error):
+            return False
+        return True
+
+    def release(self) -> None:
+        self._container.close()
+
+
+def _select_capture_class():
+    if settings.VIDEO_DECODER == "pyav":
+        try:
+            import av  # noqa: F401
+            print("Video decoder initialized: pyav")
+            return PyAVCapture
+        except ImportError as e:
+            print(f"Video decoder 'pyav' is unavailable ({e}), falling back to OpenCV.")
+    print("Video decoder initialized: opencv")
+    return OpenCVCapture
+
+_CAPTURE_CLASS = _select_capture_class()
+
+
+def open_video_capture(url: str) -> VideoCapture:
+    """Открывает поток бэкендом из VIDEO_DECODER; OSError, если поток не открылся."""
+    return _CAPTURE_CLASS(url)
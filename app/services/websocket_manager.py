@@ -1,32 +1,101 @@
 import asyncio
-import json
+import logging
+import orjson
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, Optional, Set
 
-from app.services.redis_publisher import RedisPublisher
+from app.services.pubsub_hub import pubsub_hub
+
+logger = logging.getLogger(__name__)
+
+# Redis channels are named camera:<camera_id>
+CHANNEL_PREFIX = b"camera:"
 
 # --- WebSocket Manager ---
 class ConnectionManager:
-    """Manages active WebSocket connections."""
+    """Manages active WebSocket connections and which cameras each of them follows.
+
+    A new client receives events from every camera until it sends
+    {"subscribe": ["cam_001", ...]}; after that only the listed cameras'
+    events are sent to it. "*" in the list subscribes to all cameras again.
+    """
+    ALL_CAMERAS = "*"
+
     def __init__(self):
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
+        # Clients that follow every camera, e.g. admin UIs
+        self.all_cameras: Set[WebSocket] = set()
+        # camera_id -> clients subscribed to that camera
+        self.subscribers: Dict[str, Set[WebSocket]] = {}
+        self._subscriptions: Dict[WebSocket, Set[str]] = {}
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections.add(websocket)
+        self.all_cameras.add(websocket)
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        # discard: the endpoint and a failed broadcast may both drop the same client
+        self.active_connections.discard(websocket)
+        self._unsubscribe(websocket)
+
+    def subscribe(self, websocket: WebSocket, camera_ids: Iterable[str]):
+        """Replaces the set of cameras a client receives events from."""
+        if websocket not in self.active_connections:
+            return
+        self._unsubscribe(websocket)
+        camera_ids = set(camera_ids)
+        if self.ALL_CAMERAS in camera_ids:
+            self.all_cameras.add(websocket)
+            return
+        self._subscriptions[websocket] = camera_ids
+        for camera_id in camera_ids:
+            self.subscribers.setdefault(camera_id, set()).add(websocket)
+
+    def _unsubscribe(self, websocket: WebSocket):
+        self.all_cameras.discard(websocket)
+        for camera_id in self._subscriptions.pop(websocket, ()):
+            subscribers = self.subscribers.get(camera_id)
+            if subscribers is not None:
+                subscribers.discard(websocket)
+                if not subscribers:
+                    del self.subscribers[camera_id]
+
+    def handle_client_message(self, websocket: WebSocket, text: str):
+        """Applies a {"subscribe": [camera_id, ...]} message; anything else is ignored."""
+        try:
+            message = orjson.loads(text)
+        except orjson.JSONDecodeError:
+            logger.warning("Ignoring non-JSON WebSocket message: %.100s", text)
+            return
+        camera_ids = message.get("subscribe") if isinstance(message, dict) else None
+        if not isinstance(camera_ids, list) or not all(isinstance(c, str) for c in camera_ids):
+            logger.warning("Ignoring unknown WebSocket message: %.100s", text)
+            return
+        self.subscribe(websocket, camera_ids)
 
     async def broadcast(self, message: Dict):
-        """Sends a JSON message to all active connections."""
-        message_json = json.dumps(message)
-        connections = self.active_connections[:]
-        for connection in connections:
-            try:
-                await connection.send_text(message_json)
-            except RuntimeError:
+        """Sends a JSON message to the clients following its data.camera_id (all clients if it has none)."""
+        camera_id = message.get("data", {}).get("camera_id")
+        await self.broadcast_text(orjson.dumps(message).decode(), camera_id)
+
+    async def broadcast_text(self, text: str, camera_id: Optional[str] = None):
+        """Sends an already serialized JSON message to the clients following camera_id, or to all of them."""
+        if camera_id is None:
+            connections = list(self.active_connections)
+        else:
+            # A client is either in all_cameras or in per-camera sets, never both
+            connections = [*self.all_cameras, *self.subscribers.get(camera_id, ())]
+        if not connections:
+            return
+        # Send to everyone concurrently so one slow client does not delay the rest
+        results = await asyncio.gather(*(connection.send_text(text) for connection in connections),
+                                       return_exceptions=True)
+        for connection, result in zip(connections, results):
+            if isinstance(result, (RuntimeError, WebSocketDisconnect)):
                 self.disconnect(connection)
+            elif isinstance(result, Exception):
+                logger.warning("Error sending WebSocket message: %s", result)
 
 manager = ConnectionManager()
 websocket_router = APIRouter()
@@ -35,40 +104,50 @@ websocket_listener_task: Optional[asyncio.Task] = None
 # --- Redis Listener for WebSocket Broadcast ---
 async def websocket_redis_listener():
     """Listens to Redis Pub/Sub and broadcasts messages to all WebSocket clients."""
-    pubsub = None
     try:
-        redis_publisher = RedisPublisher()
-        pubsub = redis_publisher.r.pubsub()
-        await pubsub.psubscribe("camera:*")
-        print("WebSocket Redis listener started, subscribed to camera:*")
-
-        async for message in pubsub.listen():
-            if message and message["type"] == "pmessage":
-                try:
-                    data = json.loads(message["data"])
-                    await manager.broadcast(data)
-                except json.JSONDecodeError:
-                    print(f"Failed to decode JSON message from Redis: {message['data']}")
-                except Exception as e:
-                    print(f"Error processing message in WebSocket listener: {e}")
+        logger.info("WebSocket Redis listener started, subscribed to camera channels")
+        async for channel, data in pubsub_hub.listen():
+            try:
+                # Camera events are already JSON: forward them as-is instead of parsing and re-serializing;
+                # the camera comes from the channel name camera:<id>
+                await manager.broadcast_text(data.decode(), channel[len(CHANNEL_PREFIX):].decode())
+            except Exception as e:
+                logger.warning("Error processing message in WebSocket listener: %s", e)
     except asyncio.CancelledError:
-        print("WebSocket listener task cancelled.")
+        logger.info("WebSocket listener task cancelled.")
     except Exception as e:
-        print(f"WebSocket listener error: {e}")
+        logger.warning("WebSocket listener error: %s", e)
     finally:
-        if pubsub:
-            await pubsub.close()
-        print("WebSocket listener stopped.")
+        logger.info("WebSocket listener stopped.")
+
+
+def start_websocket_listener():
+    """Starts the Redis -> WebSocket listener task unless it is already running."""
+    global websocket_listener_task
+    if websocket_listener_task is not None and not websocket_listener_task.done():
+        return
+    websocket_listener_task = asyncio.create_task(websocket_redis_listener())
+
+async def stop_websocket_listener():
+    global websocket_listener_task
+    if websocket_listener_task:
+        websocket_listener_task.cancel()
+        try: await websocket_listener_task
+        except asyncio.CancelledError: pass
+        websocket_listener_task = None
 
 
 # --- WebSocket Endpoint ---
 @websocket_router.websocket("/events")
 async def websocket_endpoint(websocket: WebSocket):
-    """Client endpoint for receiving real-time events."""
+    """Client endpoint for receiving real-time events; send {"subscribe": [camera_id, ...]} to filter by camera."""
     await manager.connect(websocket)
     try:
-        while True:
-            await websocket.receive_text() 
-    except WebSocketDisconnect:
+        # Clients only send subscription changes; binary frames are ignored.
+        # Keepalive is uvicorn's protocol-level ping (--ws-ping-interval, 20s by default)
+        while (message := await websocket.receive())["type"] != "websocket.disconnect":
+            if message.get("text"):
+                manager.handle_client_message(websocket, message["text"])
+    finally:
         manager.disconnect(websocket)
-        print("Client disconnected from WebSocket.")
\ No newline at end of file
+        logger.info("Client disconnected from WebSocket.")
\ No newline at end of file
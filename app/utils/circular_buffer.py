@@ -1,25 +1,70 @@
-from collections import deque
-from typing import Any, Optional, Deque
+import numpy as np
+from typing import Optional, Tuple
 
 class CircularBuffer:
-    """A thread-safe circular buffer for storing frames."""
+    """A circular buffer of frames backed by one preallocated contiguous array.
+
+    Storage is allocated from the first frame's shape (and reallocated if the
+    resolution changes), so each put is a copy into already-mapped memory
+    instead of a fresh multi-megabyte allocation per frame.
+
+    The only mutable position is _count, the number of frames ever put. The
+    single producer (the stream reader thread) bumps it with one int store
+    after the slot is written, so readers get a consistent snapshot from one
+    read without a lock.
+    """
     def __init__(self, capacity: int):
         self.capacity: int = capacity
-        self._buffer: Deque[Any] = deque(maxlen=capacity)
+        self._frames: Optional[np.ndarray] = None
+        self._timestamps: np.ndarray = np.zeros(capacity, dtype=np.float64)
+        self._count: int = 0
+
+    def _ensure_storage(self, shape: Tuple[int, ...], dtype: np.dtype) -> None:
+        if self._frames is None or self._frames.shape[1:] != shape or self._frames.dtype != dtype:
+            self._count = 0
+            self._frames = np.empty((self.capacity, *shape), dtype=dtype)
+
+    def next_slot(self, shape: Tuple[int, ...], dtype: np.dtype = np.uint8) -> np.ndarray:
+        """Returns a writable view of the slot the next put() fills, so a decoder can write straight into it."""
+        self._ensure_storage(shape, dtype)
+        return self._frames[self._count % self.capacity]
+
+    def put(self, frame: np.ndarray, timestamp: float) -> None:
+        """Stores a frame in the next slot. If the buffer is full, the oldest frame is overwritten.
+
+        A frame that was decoded into next_slot() is committed without copying.
+        """
+        self._ensure_storage(frame.shape, frame.dtype)
+        idx = self._count % self.capacity
+        slot = self._frames[idx]
+        if frame.ctypes.data != slot.ctypes.data:
+            np.copyto(slot, frame)
+        self._timestamps[idx] = timestamp
+        self._count += 1
+
+    def holds(self, frame: np.ndarray, timestamp: float) -> bool:
+        """Checks that a frame view is still safe to read: its slot was not reused and is not being decoded into.
 
-    def put(self, item: Any) -> None:
-        """Adds an item to the buffer. If the buffer is full, the oldest item is discarded."""
-        self._buffer.append(item)
+        Frames that do not live in the ring (e.g. pushed frames) are always safe.
+        """
+        if self._frames is None or not np.may_share_memory(frame, self._frames):
+            return True
+        idx = (frame.ctypes.data - self._frames.ctypes.data) // self._frames[0].nbytes
+        return idx != self._count % self.capacity and self._timestamps[idx] == timestamp
 
-    def get_latest(self) -> Optional[Any]:
-        """Returns the latest item added to the buffer."""
-        if not self._buffer:
+    def get_latest(self) -> Optional[Tuple[np.ndarray, float]]:
+        """Returns a view of the latest frame and its timestamp."""
+        count = self._count
+        if not count:
             return None
-        return self._buffer[-1]
+        idx = (count - 1) % self.capacity
+        return self._frames[idx], float(self._timestamps[idx])
 
-    def get_all(self) -> list[Any]:
-        """Returns all items in the buffer, from oldest to newest."""
-        return list(self._buffer)
+    def get_all(self) -> list[Tuple[np.ndarray, float]]:
+        """Returns views of all frames in the buffer, from oldest to newest."""
+        count = self._count
+        return [(self._frames[i % self.capacity], float(self._timestamps[i % self.capacity]))
+                for i in range(max(0, count - self.capacity), count)]
 
     def __len__(self) -> int:
-        return len(self._buffer)
+        return min(self._count, self.capacity)
@@ -1,23 +1,37 @@
-import asyncio
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 from app.api.cameras import router as cameras_router
 from app.services.websocket_manager import websocket_router
 
 from app.services.telegram_bot import start_telegram_listener, stop_telegram_listener
-from app.services.websocket_manager import websocket_redis_listener
+from app.services.websocket_manager import start_websocket_listener, stop_websocket_listener
 from app.services.camera_worker import load_cameras_from_db
+from app.services.redis_publisher import redis_publisher
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Код, который выполнится при старте приложения
     print("Application startup...")
+
+    # Логи пишет отдельный поток: в цикле событий logger.* только кладет запись в очередь,
+    # без синхронной записи в stdout
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    log_handler = QueueHandler(log_queue)
+    log_listener = QueueListener(log_queue, logging.StreamHandler())
+    root_logger = logging.getLogger()
+    root_logger.addHandler(log_handler)
+    root_logger.setLevel(logging.INFO)
+    log_listener.start()
     
     # Запускаем наших слушателей
     start_telegram_listener()
-    # Для вебсокета тоже создадим задачу
-    websocket_task = asyncio.create_task(websocket_redis_listener())
+    # Слушатель Redis для вебсокетов запускается только здесь, один на процесс
+    start_websocket_listener()
 
     await load_cameras_from_db()
 
@@ -28,17 +42,18 @@ async def lifespan(app: FastAPI):
     
     # Грациозно останавливаем наших слушателей
     await stop_telegram_listener()
-    
-    websocket_task.cancel()
-    try:
-        await websocket_task
-    except asyncio.CancelledError:
-        pass
+    await stop_websocket_listener()
+
+    # Досылаем события, накопленные в очереди публикации
+    await redis_publisher.close()
 
+    # Дописываем оставшиеся в очереди логи
+    root_logger.removeHandler(log_handler)
+    log_listener.stop()
     
 
 # Создаем приложение с новым менеджером жизненного цикла
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Подключаем роутеры
 app.include_router(cameras_router, prefix="/api", tags=["Cameras"])